@@ -1,3 +1,5 @@
+import sys
+
 from dama import cli
 
-cli.run()
+sys.exit(cli.main())
@@ -0,0 +1,135 @@
+import collections
+
+from dama.board import PIECE_CODES, encoded_size, get_geometry
+
+import numpy
+
+# Positions are int8 arrays indexed [n, x, y], holding PIECE_CODES
+# (0 for an empty square); `players` holds 1 where black is to move.
+
+BatchResult = collections.namedtuple(
+    'BatchResult', ['movable', 'mobility', 'material', 'captures'])
+
+EMPTY, WHITE, BLACK, WHITE_KING, BLACK_KING = range(5)
+SWAP_COLORS = numpy.array([EMPTY, BLACK, WHITE, BLACK_KING, WHITE_KING],
+                          dtype=numpy.int8)
+DIRECTIONS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+
+
+def boards_to_arrays(boards):
+    boards = list(boards)
+    size = boards[0].size
+    squares = numpy.zeros((len(boards), size, size), dtype=numpy.int8)
+    players = numpy.zeros(len(boards), dtype=numpy.int8)
+    for n, board in enumerate(boards):
+        for (x, y), c in board.pieces.items():
+            squares[n, x, y] = PIECE_CODES[c]
+        players[n] = board.player == 'b'
+    return squares, players
+
+
+def _divide(digits, divisor):
+    # Long division of little-endian base-256 numbers, one per row
+    remainder = numpy.zeros(len(digits), dtype=numpy.int64)
+    for j in range(digits.shape[1] - 1, -1, -1):
+        current = remainder * 256 + digits[:, j]
+        digits[:, j] = current // divisor
+        remainder = current % divisor
+    return remainder
+
+
+def unpack(buffer, size):
+    # Decode Board.to_bytes() records of one board size, all at once
+    record = encoded_size(size)
+    data = numpy.frombuffer(buffer, dtype=numpy.uint8).reshape(-1, record)
+    if (data[:, 0] != size).any():
+        raise ValueError('bad data')
+    digits = data[:, 1:].astype(numpy.int64)
+    players = _divide(digits, 2).astype(numpy.int8)
+    squares = numpy.zeros((len(data), size, size), dtype=numpy.int8)
+    for x, y in get_geometry(size).squares:
+        squares[:, x, y] = _divide(digits, 5)
+    if digits.any():
+        raise ValueError('bad data')
+    return squares, players
+
+
+def _shifted(padded, size, dx, dy, k):
+    # Value k steps away in direction (dx, dy); False/0 off the board
+    x = size + k * dx
+    y = size + k * dy
+    return padded[:, x:x+size, y:y+size]
+
+
+def _pad(a, size):
+    return numpy.pad(a, ((0, 0), (size, size), (size, size)))
+
+
+def analyze(squares, players):
+    squares = numpy.asarray(squares, dtype=numpy.int8)
+    players = numpy.asarray(players, dtype=bool)
+    count, size, _ = squares.shape
+
+    # Turn every board so that the side to move is white, moving up
+    flipped = SWAP_COLORS[squares[:, :, ::-1]]
+    squares = numpy.where(players[:, None, None], flipped, squares)
+    xs, ys = numpy.indices((size, size))
+    playable = (xs + ys) % 2 == 0
+    playable = numpy.where(players[:, None, None], playable[:, ::-1],
+                           playable)
+
+    men = squares == WHITE
+    kings = squares == WHITE_KING
+    opponent = (squares == BLACK) | (squares == BLACK_KING)
+    empty = (squares == EMPTY) & playable
+
+    padded_empty = _pad(empty, size)
+    padded_opponent = _pad(opponent, size)
+
+    # Number of consecutive empty squares starting at each square,
+    # for each direction
+    runs = {}
+    for dx, dy in DIRECTIONS:
+        clear = empty
+        run = empty.astype(numpy.int32)
+        for k in range(1, size):
+            clear = clear & _shifted(padded_empty, size, dx, dy, k)
+            run += clear
+        runs[dx, dy] = _pad(run, size)
+
+    man_steps = numpy.zeros(squares.shape, dtype=numpy.int32)
+    man_takes = numpy.zeros(squares.shape, dtype=numpy.int32)
+    for dx in -1, 1:
+        man_steps += men & _shifted(padded_empty, size, dx, 1, 1)
+        man_takes += (men & _shifted(padded_opponent, size, dx, 1, 1)
+                      & _shifted(padded_empty, size, dx, 1, 2))
+
+    king_steps = numpy.zeros(squares.shape, dtype=numpy.int32)
+    king_takes = numpy.zeros(squares.shape, dtype=numpy.int32)
+    for dx, dy in DIRECTIONS:
+        king_steps += kings * _shifted(runs[dx, dy], size, dx, dy, 1)
+        clear = kings
+        for k in range(1, size):
+            victims = clear & _shifted(padded_opponent, size, dx, dy, k)
+            king_takes += victims * _shifted(runs[dx, dy], size, dx, dy, k + 1)
+            clear = clear & _shifted(padded_empty, size, dx, dy, k)
+
+    has_king_takes = king_takes.any(axis=(1, 2))[:, None, None]
+    has_man_takes = man_takes.any(axis=(1, 2))[:, None, None]
+    mobility = numpy.where(
+        has_king_takes, king_takes,
+        numpy.where(has_man_takes, man_takes, man_steps + king_steps))
+
+    # Turn the results back
+    mobility = numpy.where(players[:, None, None], mobility[:, :, ::-1],
+                           mobility)
+    material = numpy.stack([(squares == code).sum(axis=(1, 2))
+                            for code in range(1, 5)], axis=1)
+    material = numpy.where(players[:, None], material[:, [1, 0, 3, 2]],
+                           material)
+    return BatchResult(
+        movable=mobility > 0,
+        mobility=mobility.sum(axis=(1, 2)),
+        material=material,
+        captures=(has_king_takes | has_man_takes)[:, 0, 0],
+    )
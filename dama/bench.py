@@ -0,0 +1,235 @@
+import os
+import random
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+from dama.board import Board, MoveCache, openings
+from dama.bitboard import BitBoard
+from dama.compact import CompactBoard
+from dama import book
+from dama import engine
+from dama import mcts
+
+BENCHMARKS = {}
+BOARD_CLASSES = [Board, BitBoard, CompactBoard]
+
+
+def benchmark(func):
+    BENCHMARKS[func.__name__.replace('_', '-')] = func
+    return func
+
+
+def _time_per_call(func, number):
+    return min(timeit.repeat(func, number=number, repeat=3)) / number
+
+
+@benchmark
+def construct(sizes=range(8, 27, 2), number=200):
+    print('size  Board()   load()   from_bytes()   (microseconds per call)')
+    for size in sizes:
+        board = Board(size=size)
+        diagram = board.dump()
+        data = board.to_bytes()
+        times = [
+            _time_per_call(lambda: Board(size=size), number),
+            _time_per_call(lambda: Board.load(diagram), number),
+            _time_per_call(lambda: Board.from_bytes(data), number),
+        ]
+        print(f'{size:4}' + ''.join(f'{t * 1e6:9.1f}' for t in times))
+
+
+def _bytes_per_board(make, count):
+    make()
+    tracemalloc.start()
+    try:
+        boards = [make() for i in range(count)]
+        return tracemalloc.get_traced_memory()[0] / len(boards)
+    finally:
+        tracemalloc.stop()
+
+
+@benchmark
+def memory(sizes=(8, 10, 12, 16, 20, 26), count=1000):
+    # Boards that share one move cache, as in search and the server
+    print('size' + ''.join(f'{cls.__name__:>14}' for cls in BOARD_CLASSES)
+          + '   (bytes per board)')
+    cache = MoveCache()
+    for size in sizes:
+        results = [
+            _bytes_per_board(lambda: cls(size=size, move_cache=cache), count)
+            for cls in BOARD_CLASSES]
+        print(f'{size:4}' + ''.join(f'{r:14.0f}' for r in results))
+
+
+@benchmark
+def clone(sizes=(8, 10, 12, 16, 20, 26), number=2000):
+    print('size' + ''.join(f'{cls.__name__:>14}' for cls in BOARD_CLASSES)
+          + f'{"via bytes":>14}   (microseconds per clone)')
+    for size in sizes:
+        boards = [cls(size=size) for cls in BOARD_CLASSES]
+        times = [_time_per_call(board.clone, number) for board in boards]
+        board = boards[0]
+        times.append(_time_per_call(
+            lambda: Board.from_bytes(board.to_bytes()), number))
+        print(f'{size:4}' + ''.join(f'{t * 1e6:14.2f}' for t in times))
+
+
+@benchmark
+def replay(sizes=(8, 12, 16, 26), plies=100, repeat=3):
+    # Replaying random games; "prefix walk" is the validation make_move
+    # used to do, through possible_moves() and get_jumped()
+    print(f'size{"make_move":>12}{"prefix walk":>13}'
+          + '   (microseconds per move)')
+    rng = random.Random(0)
+    for size in sizes:
+        board = Board(size=size)
+        paths = []
+        for i in range(plies):
+            moves = board.legal_moves()
+            if not moves:
+                break
+            paths.append(rng.choice(moves).path)
+            board.make_move(paths[-1])
+
+        def make_moves():
+            board = Board(size=size)
+            for path in paths:
+                board.make_move(path)
+
+        def walk_prefixes():
+            board = Board(size=size)
+            for path in paths:
+                board.move_finished(path)
+                board.get_jumped(path)
+                board.make_move(path)
+
+        times = [min(timeit.repeat(func, number=1, repeat=repeat))
+                 for func in (make_moves, walk_prefixes)]
+        # The walk also includes make_move itself
+        times[1] -= times[0]
+        print(f'{size:4}' + ''.join(f'{t / len(paths) * 1e6:{w}.1f}'
+                                    for t, w in zip(times, (12, 13))))
+
+
+def king_capture_board(size, kings=2):
+    # Black men every 4 squares in both directions, with white kings in
+    # the corners: a king can capture them in a great many orders, with
+    # several landing squares after each capture
+    pieces = {(x, y): 'b'
+              for x in range(2, size - 1, 4)
+              for y in range(2, size - 1, 4)}
+    corners = [(0, 0), (size - 1, size - 1), (size - 1, 1),
+               (0, size - 2 + size % 2)]
+    for pos in corners[:kings]:
+        pieces[pos] = 'W'
+    return Board(size=size, pieces=pieces)
+
+
+@benchmark
+def king_captures(sizes=range(8, 27, 2), kings=2, max_paths=100000):
+    # Listing every capture path is only timed for up to max_paths paths;
+    # count_moves() and capture_groups() are timed for every size
+    print(f'size{"paths":>16}{"count":>9}{"list":>9}{"groups":>9}'
+          + f'{"moves":>9}{"group":>9}   (seconds)')
+    for size in sizes:
+        board = king_capture_board(size, kings)
+        start = time.perf_counter()
+        paths = board.count_moves()
+        count_time = time.perf_counter() - start
+        if paths <= max_paths:
+            start = time.perf_counter()
+            board.legal_moves()
+            list_time = f'{time.perf_counter() - start:9.3f}'
+        else:
+            list_time = f'{"-":>9}'
+        start = time.perf_counter()
+        groups = board.capture_groups()
+        group_time = time.perf_counter() - start
+        moves = sum(len(group.moves) for group in groups)
+        print(f'{size:4}{paths:16}{count_time:9.3f}{list_time}'
+              + f'{len(groups):9}{moves:9}{group_time:9.3f}')
+
+
+@benchmark
+def evaluate(sizes=(8, 12, 16, 26), positions=20, number=500):
+    # Positions from random games; evaluate() uses the terms kept up to
+    # date by make_move, evaluate_from_scratch() goes over all pieces
+    functions = [engine.evaluate, engine.evaluate_from_scratch]
+    print('size' + ''.join(f'{func.__name__:>24}' for func in functions)
+          + '   (evaluations per second)')
+    rng = random.Random(0)
+    for size in sizes:
+        boards = []
+        board = Board(size=size)
+        while len(boards) < positions:
+            moves = board.legal_moves()
+            if not moves:
+                board = Board(size=size)
+                continue
+            board.make_move(rng.choice(moves).path)
+            boards.append(board.clone())
+        rates = [len(boards) / sum(_time_per_call(lambda: func(board), number)
+                                   for board in boards)
+                 for func in functions]
+        print(f'{size:4}' + ''.join(f'{rate:24.0f}' for rate in rates))
+
+
+@benchmark
+def book_lookup(size=8, plies=3, number=200):
+    # Book with every line of `plies` moves; the positions after all
+    # `plies` moves are misses
+    lines = openings(size, plies)
+    builder = book.BookBuilder(size, plies)
+    for line in lines:
+        builder.add_game(line)
+    hits = []
+    misses = []
+    for line in lines[::max(1, len(lines) // 20)]:
+        board = Board(size=size)
+        for path in line:
+            hits.append(board.clone())
+            board.make_move(path)
+        misses.append(board)
+    fd, path = tempfile.mkstemp(suffix='.book')
+    os.close(fd)
+    try:
+        count = builder.write(path)
+        with book.Book(path) as opening_book:
+            print(f'{count} entries, {os.path.getsize(path)} bytes')
+            for name, boards in ('hit', hits), ('miss', misses):
+                t = sum(_time_per_call(lambda: opening_book.lookup(board),
+                                       number)
+                        for board in boards) / len(boards)
+                print(f'{name:5}{t * 1e6:9.2f} microseconds per lookup')
+    finally:
+        os.remove(path)
+
+
+@benchmark
+def mcts_playouts(sizes=(8, 10, 12), playouts=200):
+    print(f'size{"playouts/s":>12}{"nodes":>8}{"bytes/node":>12}')
+    for size in sizes:
+        result = mcts.MCTS(seed=0).search(Board(size=size),
+                                          node_limit=playouts)
+        print(f'{size:4}{result.nps:12.0f}{result.tree_nodes:8}'
+              + f'{result.tree_bytes / result.tree_nodes:12.1f}')
+
+
+def add_arguments(parser):
+    parser.add_argument('names', nargs='*', metavar='NAME',
+                        help='benchmarks to run (default: all): '
+                        + ', '.join(BENCHMARKS))
+    parser.set_defaults(func=main)
+
+
+def main(args):
+    for name in args.names:
+        if name not in BENCHMARKS:
+            print(f'unknown benchmark: {name}')
+            return 1
+    for name in args.names or BENCHMARKS:
+        print(f'{name}:')
+        BENCHMARKS[name]()
+    return 0
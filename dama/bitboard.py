@@ -0,0 +1,269 @@
+import collections
+import functools
+
+from dama.board import Board, MoveCache, SubMove, MoveRecord, DIRS
+from dama.board import get_geometry, get_zobrist_keys
+
+OPPONENTS = {'w': 'b', 'b': 'w'}
+
+BitGeometry = collections.namedtuple(
+    'BitGeometry', ['stride', 'playable', 'bits', 'coords', 'shifts', 'rows'])
+
+
+@functools.lru_cache()
+def get_bit_geometry(size):
+    # Playable squares are numbered (y * stride + x) // 2 with an odd stride
+    # wider than the board, so every diagonal step is a constant shift and
+    # stepping off the left/right edge lands on an unplayable "ghost" bit.
+    stride = (size + 1) | 1
+    bits = {}
+    for y in range(size):
+        for x in range(size):
+            if (x + y) % 2 == 0:
+                bits[x, y] = 1 << (y * stride + x) // 2
+    shifts = {(dx, dy): (dy * stride + dx) // 2
+              for dx in (-1, 1) for dy in (-1, 1)}
+    rows = [sum(bits.get((x, y), 0) for x in range(size))
+            for y in range(size)]
+    return BitGeometry(
+        stride=stride,
+        playable=sum(bits.values()),
+        bits=bits,
+        coords={b: c for c, b in bits.items()},
+        shifts=shifts,
+        rows=rows,
+    )
+
+
+def shift(b, s):
+    if s > 0:
+        return b << s
+    else:
+        return b >> -s
+
+
+class BitBoard(Board):
+    def __init__(self, size=8, move_cache=None, pieces=None, player='w'):
+        self.size = size
+        self.player = player
+        if move_cache is None:
+            move_cache = MoveCache()
+        self._move_cache = move_cache
+        self._zobrist = get_zobrist_keys(size)
+        self._geometry = get_geometry(size)
+        self.bit_geometry = get_bit_geometry(size)
+        self.valid_coords = self._geometry.valid_coords
+
+        self.masks = {'w': 0, 'b': 0, 'W': 0, 'B': 0}
+        if pieces is None:
+            for y in range(3):
+                self.masks['w'] |= self.bit_geometry.rows[y]
+            for y in range(self.size-3, self.size):
+                self.masks['b'] |= self.bit_geometry.rows[y]
+        else:
+            bits = self.bit_geometry.bits
+            for pos, c in pieces.items():
+                self.masks[c] |= bits[pos]
+        self._update_empty()
+        self.hash = self.compute_hash()
+        self.eval_terms = self.compute_eval_terms()
+
+    def _update_empty(self):
+        occupied = 0
+        for mask in self.masks.values():
+            occupied |= mask
+        self.empty = self.bit_geometry.playable & ~occupied
+
+    @classmethod
+    def from_board(cls, board, move_cache=None):
+        return cls(size=board.size, move_cache=move_cache,
+                   pieces=board.pieces, player=board.player)
+
+    def clone(self):
+        new = object.__new__(type(self))
+        new.__dict__.update(self.__dict__)
+        new.size = self.size
+        new.player = self.player
+        new._move_cache = self._move_cache
+        new._zobrist = self._zobrist
+        new._geometry = self._geometry
+        new.valid_coords = self.valid_coords
+        new.hash = self.hash
+        new.eval_terms = self.eval_terms
+        new.masks = dict(self.masks)
+        return new
+
+    @property
+    def pieces(self):
+        coords = self.bit_geometry.coords
+        result = {}
+        for c, mask in self.masks.items():
+            while mask:
+                b = mask & -mask
+                result[coords[b]] = c
+                mask ^= b
+        return result
+
+    def _piece_at(self, b):
+        for c, mask in self.masks.items():
+            if mask & b:
+                return c
+        return None
+
+    def _movable(self):
+        player = self.player
+        opponent = OPPONENTS[player]
+        men = self.masks[player]
+        kings = self.masks[player.upper()]
+        opp = self.masks[opponent] | self.masks[opponent.upper()]
+        empty = self.empty
+        shifts = self.bit_geometry.shifts
+        forward = DIRS[player]
+
+        king_takes = 0
+        man_takes = 0
+        steps = 0
+        for (x_direction, y_direction), s in shifts.items():
+            # Kings slide over empty squares, then need an opponent's piece
+            # followed by an empty square.
+            slid = frontier = kings
+            while frontier:
+                frontier = shift(frontier, s) & empty
+                slid |= frontier
+            landing = shift(shift(slid, s) & opp, s) & empty
+            frontier = shift(shift(landing, -s), -s)
+            while frontier:
+                king_takes |= frontier & kings
+                frontier = shift(frontier & empty, -s)
+
+            steps |= shift(shift(kings, s) & empty, -s)
+            if y_direction == forward:
+                steps |= shift(shift(men, s) & empty, -s)
+                landing = shift(shift(men, s) & opp, s) & empty
+                man_takes |= shift(shift(landing, -s), -s)
+
+        return king_takes or man_takes or steps
+
+    def _piece(self, pos):
+        return self._piece_at(self.bit_geometry.bits[pos])
+
+    def _may_start(self, start, priority):
+        return bool(self._movable() & self.bit_geometry.bits[start])
+
+    def _get_submoves(self, prefix):
+        if prefix:
+            return super()._get_submoves(prefix)
+        coords = self.bit_geometry.coords
+        movable = self._movable()
+        result = {}
+        while movable:
+            b = movable & -movable
+            result[coords[b]] = SubMove(coords[b], None)
+            movable ^= b
+        return result
+
+    def _get_steps(self, start, pos, jumped):
+        coords = self.bit_geometry.coords
+        bits = self.bit_geometry.bits
+        origin = bits[start]
+        piece = self._piece_at(origin)
+        if piece is None:
+            raise KeyError(start)
+        removed = 0
+        for p in jumped:
+            removed |= bits[p]
+        jumping = bool(removed)
+        empty = self.empty | origin
+        own = self.masks[self.player] | self.masks[self.player.upper()]
+        playable = self.bit_geometry.playable
+        is_man = piece.islower()
+        if is_man:
+            y_dirs = [DIRS[self.player]]
+        else:
+            y_dirs = -1, 1
+        result = {}
+        for x_direction in -1, 1:
+            for y_direction in y_dirs:
+                s = self.bit_geometry.shifts[x_direction, y_direction]
+                b = bits[pos]
+                taken = 0
+                while True:
+                    b = shift(b, s) & playable
+                    if not b:
+                        break
+                    if b & empty:
+                        if taken & removed:
+                            break
+                        if taken and not jumping:
+                            jumping = True
+                            result.clear()
+                        if not taken and jumping:
+                            if is_man:
+                                break
+                            continue
+                        result[coords[b]] = SubMove(coords[b],
+                                                    coords.get(taken))
+                    elif b & own:
+                        break
+                    elif not taken:
+                        taken = b
+                        continue
+                    else:
+                        break
+                    if is_man:
+                        break
+        return result
+
+    def _apply_move(self, move, jumped):
+        bits = self.bit_geometry.bits
+        keys = self._zobrist.pieces
+        tables = self._geometry.eval_tables
+        start = bits[move[0]]
+        piece = self._piece_at(start)
+        captured = []
+        terms = self.eval_terms
+        for pos in jumped:
+            take = bits[pos]
+            c = self._piece_at(take)
+            self.masks[c] ^= take
+            self.hash ^= keys[c][pos]
+            terms -= tables[c][pos]
+            captured.append((pos, c))
+        self.masks[piece] ^= start
+        self.hash ^= keys[piece][move[0]] ^ self._zobrist.player
+        terms -= tables[piece][move[0]]
+        record = MoveRecord(tuple(move), piece, captured, self.player)
+        end = bits[move[-1]]
+        if self.player == 'w':
+            self.player = 'b'
+            if end & self.bit_geometry.rows[self.size-1]:
+                piece = piece.upper()
+        else:
+            self.player = 'w'
+            if end & self.bit_geometry.rows[0]:
+                piece = piece.upper()
+        self.masks[piece] |= end
+        self.hash ^= keys[piece][move[-1]]
+        self.eval_terms = terms + tables[piece][move[-1]]
+        self._update_empty()
+        return record
+
+    def unmake_move(self, record):
+        bits = self.bit_geometry.bits
+        keys = self._zobrist.pieces
+        tables = self._geometry.eval_tables
+        start, end = record.path[0], record.path[-1]
+        piece = self._piece_at(bits[end])
+        self.masks[piece] ^= bits[end]
+        self.hash ^= keys[piece][end] ^ self._zobrist.player
+        self.masks[record.piece] |= bits[start]
+        self.hash ^= keys[record.piece][start]
+        terms = (self.eval_terms - tables[piece][end]
+                 + tables[record.piece][start])
+        for pos, c in record.captured:
+            self.masks[c] |= bits[pos]
+            self.hash ^= keys[c][pos]
+            terms += tables[c][pos]
+        self.eval_terms = terms
+        self.player = record.player
+        self._update_empty()
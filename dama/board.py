@@ -1,30 +1,222 @@
 import collections
+import functools
+import random
 import string
+import struct
 
 SubMove = collections.namedtuple('SubMove', ['pos', 'take'])
+Move = collections.namedtuple('Move', ['path', 'taken'])
+CaptureGroup = collections.namedtuple(
+    'CaptureGroup', ['start', 'taken', 'moves'])
+MoveRecord = collections.namedtuple(
+    'MoveRecord', ['path', 'piece', 'captured', 'player'])
+
+ZobristKeys = collections.namedtuple('ZobristKeys', ['pieces', 'player'])
+Geometry = collections.namedtuple(
+    'Geometry', ['size', 'squares', 'valid_coords', 'index', 'rays',
+                 'start', 'start_hash', 'eval_tables', 'start_terms'])
+CacheInfo = collections.namedtuple(
+    'CacheInfo', ['hits', 'misses', 'evictions', 'maxsize', 'currsize'])
+# Piece counts, and positional terms as white's total minus black's
+EvalTerms = collections.namedtuple(
+    'EvalTerms', ['white_men', 'black_men', 'white_kings', 'black_kings',
+                  'advance', 'center', 'back_rank'])
 
 DIRS = {'w': 1, 'b': -1}
 
+PIECE_SYMBOLS = '.wbWB'
+PIECE_CODES = {None: 0, 'w': 1, 'b': 2, 'W': 3, 'B': 4}
+
+# The evaluation terms are packed into one int, 16 bits per term.
+# Each term is stored plus TERM_BIAS, so it never goes negative and
+# borrows from its neighbour; make_move then only needs to add and
+# subtract table entries, like it does for the Zobrist hash.
+TERMS_STRUCT = struct.Struct(f'<{len(EvalTerms._fields)}H')
+TERM_BIAS = 1 << 15
+TERM_SHIFTS = tuple(range(0, TERMS_STRUCT.size * 8, 16))
+ZERO_TERMS = sum(TERM_BIAS << shift for shift in TERM_SHIFTS)
+
+
+def pack_terms(terms):
+    return ZERO_TERMS + sum(int(value) << shift
+                            for value, shift in zip(terms, TERM_SHIFTS))
+
+
+def unpack_terms(value):
+    fields = TERMS_STRUCT.unpack(value.to_bytes(TERMS_STRUCT.size, 'little'))
+    return EvalTerms._make([n - TERM_BIAS for n in fields])
+
+
+@functools.lru_cache()
+def get_eval_tables(size):
+    # What a piece on each square adds to the packed terms: material,
+    # rows advanced by men, pieces in the central squares, and men still
+    # guarding their own back row
+    top = size - 1
+    low = size // 4
+    high = size - low
+    tables = {c: {} for c in 'wbWB'}
+    for x in range(size):
+        for y in range(size):
+            if (x + y) % 2:
+                continue
+            center = low <= x < high and low <= y < high
+            tables['w'][x, y] = pack_terms(EvalTerms(
+                1, 0, 0, 0, y, center, y == 0)) - ZERO_TERMS
+            tables['b'][x, y] = pack_terms(EvalTerms(
+                0, 1, 0, 0, y - top, -center, -(y == top))) - ZERO_TERMS
+            tables['W'][x, y] = pack_terms(EvalTerms(
+                0, 0, 1, 0, 0, center, 0)) - ZERO_TERMS
+            tables['B'][x, y] = pack_terms(EvalTerms(
+                0, 0, 0, 1, 0, -center, 0)) - ZERO_TERMS
+    return tables
+
+
+@functools.lru_cache()
+def get_geometry(size):
+    # Everything about a board size that doesn't change during a game,
+    # shared by all boards of that size
+    squares = tuple(sorted((x, y)
+                           for x in range(size)
+                           for y in range(size)
+                           if (x + y) % 2 == 0))
+    valid_coords = frozenset(squares)
+    rays = {}
+    for x, y in squares:
+        rays[x, y] = directions = {}
+        for x_direction in -1, 1:
+            for y_direction in -1, 1:
+                ray = []
+                pos = x + x_direction, y + y_direction
+                while pos in valid_coords:
+                    ray.append(pos)
+                    pos = pos[0] + x_direction, pos[1] + y_direction
+                directions[x_direction, y_direction] = tuple(ray)
+    start = {}
+    for x, y in squares:
+        if y >= size - 3:
+            start[x, y] = 'b'
+        elif y < 3:
+            start[x, y] = 'w'
+    keys = get_zobrist_keys(size).pieces
+    eval_tables = get_eval_tables(size)
+    start_hash = 0
+    start_terms = ZERO_TERMS
+    for pos, c in start.items():
+        start_hash ^= keys[c][pos]
+        start_terms += eval_tables[c][pos]
+    return Geometry(
+        size=size,
+        squares=squares,
+        valid_coords=valid_coords,
+        index={pos: i for i, pos in enumerate(squares)},
+        rays=rays,
+        start=start,
+        start_hash=start_hash,
+        eval_tables=eval_tables,
+        start_terms=start_terms,
+    )
+
+
+@functools.lru_cache()
+def encoded_size(size):
+    # Size byte, then the squares as base-5 digits and the side to move
+    # as the lowest bit of a little-endian integer
+    squares = len(get_geometry(size).squares)
+    return 1 + ((5 ** squares * 2 - 1).bit_length() + 7) // 8
+
+
+def encode_boards(boards):
+    result = bytearray()
+    for board in boards:
+        result += board.to_bytes()
+    return result
+
+
+def decode_boards(buffer, board_class=None, move_cache=None):
+    if board_class is None:
+        board_class = Board
+    view = memoryview(buffer)
+    start = 0
+    while start < len(view):
+        end = start + encoded_size(view[start])
+        yield board_class.from_bytes(view[start:end], move_cache=move_cache)
+        start = end
+
+
+@functools.lru_cache()
+def get_zobrist_keys(size):
+    # Seeded by size, so hashes are stable between runs and processes
+    rng = random.Random(f'dama-zobrist-{size}')
+    pieces = {c: {(x, y): rng.getrandbits(64)
+                  for y in range(size)
+                  for x in range(size)
+                  if (x + y) % 2 == 0}
+              for c in 'wbWB'}
+    return ZobristKeys(pieces, rng.getrandbits(64))
+
+
+# LRU cache of submoves, keyed by (position hash, prefix).
+# It can be shared by any number of boards.
+class MoveCache:
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __getitem__(self, key):
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            raise
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self._entries[key] = value
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+
+    def cache_info(self):
+        return CacheInfo(self.hits, self.misses, self.evictions,
+                         self.maxsize, len(self._entries))
+
+
 class Board:
-    def __init__(self, size=8):
+    __slots__ = ('size', 'player', '_move_cache', '_zobrist', '_geometry',
+                 'valid_coords', 'pieces', 'hash', 'eval_terms')
+
+    def __init__(self, size=8, move_cache=None, pieces=None, player='w'):
         self.size = size
-        self.pieces = {}
-        self.player = 'w'
-        self._move_cache = {}
-
-        self.valid_coords = {(x, y)
-                             for x in range(self.size)
-                             for y in range(self.size)
-                             if (x + y) % 2 == 0
-                            }
-
-        for x in range(self.size):
-            for y in range(3):
-                if (x + y) % 2 == 0:
-                    self.pieces[x, y] = 'w'
-            for y in range(self.size-3, self.size):
-                if (x + y) % 2 == 0:
-                    self.pieces[x, y] = 'b'
+        self.player = player
+        if move_cache is None:
+            move_cache = MoveCache()
+        self._move_cache = move_cache
+        self._zobrist = get_zobrist_keys(size)
+        self._geometry = get_geometry(size)
+        self.valid_coords = self._geometry.valid_coords
+
+        if pieces is None:
+            self.pieces = dict(self._geometry.start)
+            self.hash = self._geometry.start_hash
+            if player == 'b':
+                self.hash ^= self._zobrist.player
+            self.eval_terms = self._geometry.start_terms
+        else:
+            self.pieces = dict(pieces)
+            self.hash = self.compute_hash()
+            self.eval_terms = self.compute_eval_terms()
 
     def __eq__(self, other):
         try:
@@ -37,6 +229,40 @@ class Board:
     def __ne__(self, other):
         return not self == other
 
+    def clone(self):
+        # A copy that shares the geometry and the move cache
+        new = object.__new__(type(self))
+        new.size = self.size
+        new.player = self.player
+        new._move_cache = self._move_cache
+        new._zobrist = self._zobrist
+        new._geometry = self._geometry
+        new.valid_coords = self.valid_coords
+        new.pieces = dict(self.pieces)
+        new.hash = self.hash
+        new.eval_terms = self.eval_terms
+        return new
+
+    def compute_hash(self):
+        keys = self._zobrist.pieces
+        result = 0
+        for pos, c in self.pieces.items():
+            result ^= keys[c][pos]
+        if self.player == 'b':
+            result ^= self._zobrist.player
+        return result
+
+    def compute_eval_terms(self):
+        tables = self._geometry.eval_tables
+        result = ZERO_TERMS
+        for pos, c in self.pieces.items():
+            result += tables[c][pos]
+        return result
+
+    @property
+    def terms(self):
+        return unpack_terms(self.eval_terms)
+
     def dump(self):
         rows = [[' ' if (x + y) % 2 == 0 else '.'
                  for x in range(self.size)] for y in range(self.size)]
@@ -53,7 +279,7 @@ class Board:
         return '\n'.join(result)
 
     @classmethod
-    def load(cls, source):
+    def load(cls, source, move_cache=None):
         if source.startswith('[w]'):
             player = 'w'
         elif source.startswith('[b]'):
@@ -63,25 +289,54 @@ class Board:
         rows = [r for r in source.splitlines() if r.count('|') == 2]
         if not rows:
             raise ValueError('no data found')
-        self = cls(size=len(rows))
-        self.player = player
-        self.pieces.clear()
+        size = len(rows)
+        pieces = {}
         for ym, row in enumerate(rows):
             pre, row, post = row.split('|')
-            y = self.size-1-ym
-            if len(row) != self.size:
+            y = size-1-ym
+            if len(row) != size:
                 raise ValueError('bad number of columns')
             for x, c in enumerate(row):
-                if (x, y) in self.valid_coords:
+                if (x + y) % 2 == 0:
                     if c == '.':
                         continue
                     if c not in 'wbWB':
                         raise ValueError('bad symbol: ' + c)
-                    self.pieces[x, y] = c
+                    pieces[x, y] = c
                 else:
                     if c != ' ':
                         raise ValueError('symbol on bad tile: ' + c)
-        return self
+        return cls(size=size, move_cache=move_cache, pieces=pieces,
+                   player=player)
+
+    def to_bytes(self):
+        squares = self._geometry.squares
+        get = self.pieces.get
+        value = 0
+        for pos in reversed(squares):
+            value = value * 5 + PIECE_CODES[get(pos)]
+        value = value * 2 + (self.player == 'b')
+        return bytes([self.size]) + value.to_bytes(
+            encoded_size(self.size) - 1, 'little')
+
+    @classmethod
+    def from_bytes(cls, data, move_cache=None):
+        size = data[0]
+        value = int.from_bytes(data[1:encoded_size(size)], 'little')
+        if value & 1:
+            player = 'b'
+        else:
+            player = 'w'
+        value >>= 1
+        pieces = {}
+        for pos in get_geometry(size).squares:
+            value, code = divmod(value, 5)
+            if code:
+                pieces[pos] = PIECE_SYMBOLS[code]
+        if value:
+            raise ValueError('bad data')
+        return cls(size=size, move_cache=move_cache, pieces=pieces,
+                   player=player)
 
     def _get_submoves(self, prefix):
         result = {}
@@ -105,58 +360,56 @@ class Board:
                             result.clear()
                         result[x, y] = SubMove((x, y), None)
         else:
-            prev = [prefix[0]]
-            piece = self.pieces[prefix[0]]
-            removed = set(self.get_jumped(prefix))
-            if removed:
-                jumping = True
-            else:
-                jumping = False
-                if len(prefix) > 1:
-                    return {}
-            removed.add(prefix[0])
-            if piece.islower():
-                y_dirs = [DIRS[self.player]]
-            else:
-                y_dirs = -1, 1
-            for x_direction in -1, 1:
-                for y_direction in y_dirs:
-                    x, y = prefix[-1]
-                    taken = None
-                    while True:
-                        x += x_direction
-                        y += y_direction
-                        if (x, y) not in self.valid_coords:
+            taken = self.get_jumped(prefix)
+            if not taken and len(prefix) > 1:
+                return {}
+            result = self._get_steps(prefix[0], prefix[-1], taken)
+        return result
+
+    def _get_steps(self, start, pos, jumped):
+        result = {}
+        piece = self.pieces[start]
+        removed = set(jumped)
+        jumping = bool(removed)
+        removed.add(start)
+        if piece.islower():
+            y_dirs = [DIRS[self.player]]
+        else:
+            y_dirs = -1, 1
+        rays = self._geometry.rays[pos]
+        for x_direction in -1, 1:
+            for y_direction in y_dirs:
+                taken = None
+                for x, y in rays[x_direction, y_direction]:
+                    p = self.pieces.get((x, y))
+                    if not p or (x, y) == start:
+                        if taken in removed:
                             break
-                        p = self.pieces.get((x, y))
-                        if not p or (x, y) == prefix[0]:
-                            if taken in removed:
+                        if taken and not jumping:
+                            jumping = True
+                            result.clear()
+                        if not taken and jumping:
+                            if piece.islower():
                                 break
-                            if taken and not jumping:
-                                jumping = True
-                                result.clear()
-                            if not taken and jumping:
-                                if piece.islower():
-                                    break
-                                continue
-                            result[x, y] = SubMove((x, y), taken)
-                        elif p and p.lower() == self.player:
-                            break
-                        elif not taken or p in removed:
-                            taken = x, y
                             continue
-                        else:
-                            break
-                        if piece.islower():
-                            break
+                        result[x, y] = SubMove((x, y), taken)
+                    elif p and p.lower() == self.player:
+                        break
+                    elif not taken or p in removed:
+                        taken = x, y
+                        continue
+                    else:
+                        break
+                    if piece.islower():
+                        break
         return result
 
     def get_submoves(self, prefix):
-        prefix = tuple(prefix)
+        key = self.hash, tuple(prefix)
         try:
-            c = self._move_cache[prefix]
+            c = self._move_cache[key]
         except KeyError:
-            c = self._move_cache[prefix] = self._get_submoves(prefix)
+            c = self._move_cache[key] = self._get_submoves(prefix)
         return c
 
     def possible_moves(self, prefix):
@@ -182,17 +435,230 @@ class Board:
             prev += (coord,)
         return result
 
+    def _first_steps(self):
+        # Pieces that may move and their first steps, for the highest
+        # priority only (king captures, then man captures, then moves)
+        result = []
+        max_priority = 0
+        for start, c in list(self.pieces.items()):
+            if c.lower() != self.player:
+                continue
+            steps = self._get_steps(start, start, ())
+            if not steps:
+                continue
+            if not any(submove.take for submove in steps.values()):
+                priority = 0
+            elif c.islower():
+                priority = 1
+            else:
+                priority = 2
+            if priority < max_priority:
+                continue
+            elif priority > max_priority:
+                max_priority = priority
+                result.clear()
+            result.append((start, steps))
+        return result, max_priority
+
+    def legal_moves(self, grouped=False):
+        # With `grouped`, captures that only differ in where the piece
+        # lands between captures are listed once (see capture_groups)
+        result = []
+        first_steps, priority = self._first_steps()
+        if grouped and priority:
+            for group in self.capture_groups():
+                result.extend(group.moves)
+            return result
+        for start, steps in first_steps:
+            for submove in steps.values():
+                self._find_moves([start, submove.pos], submove.take, [],
+                                 result)
+        return result
+
+    def count_moves(self):
+        # len(self.legal_moves()), without listing every capture path
+        first_steps, priority = self._first_steps()
+        if not priority:
+            return sum(len(steps) for start, steps in first_steps)
+        return sum(self._count_captures(start, start, [], 0, {})
+                   for start, steps in first_steps)
+
+    def _count_captures(self, start, pos, taken, mask, memo):
+        # Number of capture paths from `pos`; like in _find_captures,
+        # it only depends on the square and the captured set
+        key = pos, mask
+        try:
+            return memo[key]
+        except KeyError:
+            pass
+        steps = self._get_steps(start, pos, taken)
+        count = 0 if steps else 1
+        index = self._geometry.index
+        for submove in steps.values():
+            taken.append(submove.take)
+            count += self._count_captures(
+                start, submove.pos, taken, mask | 1 << index[submove.take],
+                memo)
+            taken.pop()
+        memo[key] = count
+        return count
+
+    def capture_groups(self):
+        # Captures grouped by the piece that moves and the set of pieces
+        # it captures. Each group has one move for each square the piece
+        # can end on: those lead to the same position whichever way the
+        # piece went, so a search needs no others.
+        first_steps, priority = self._first_steps()
+        if not priority:
+            return []
+        opponents = sum(c.lower() != self.player
+                        for c in self.pieces.values())
+        squares = self._geometry.squares
+        result = []
+        for start, steps in first_steps:
+            ends = {}
+            self._find_captures([start], [], 0, set(), ends, opponents)
+            groups = {}
+            for (mask, end), move in ends.items():
+                groups.setdefault(mask, []).append(move)
+            for mask, moves in groups.items():
+                taken = []
+                while mask:
+                    bit = mask & -mask
+                    taken.append(squares[bit.bit_length() - 1])
+                    mask ^= bit
+                result.append(CaptureGroup(start, frozenset(taken),
+                                           tuple(moves)))
+        return result
+
+    def _find_captures(self, path, taken, mask, seen, ends, opponents):
+        # Like _find_moves, but each (square, captured set) is only
+        # visited once: the ways to go on from there don't depend on the
+        # path that got there, e.g. on where a king landed between
+        # captures. `mask` has the bits of the captured squares' indices.
+        # Finished moves go to `ends`, keyed by (mask, end square).
+        steps = {}
+        if len(taken) < opponents:
+            steps = self._get_steps(path[0], path[-1], taken)
+        if not steps:
+            ends[mask, path[-1]] = Move(tuple(path), tuple(taken))
+            return
+        index = self._geometry.index
+        for submove in steps.values():
+            bit = 1 << index[submove.take]
+            key = submove.pos, mask | bit
+            if key in seen:
+                continue
+            seen.add(key)
+            path.append(submove.pos)
+            taken.append(submove.take)
+            self._find_captures(path, taken, mask | bit, seen, ends,
+                                opponents)
+            taken.pop()
+            path.pop()
+
+    def _find_moves(self, path, take, taken, result):
+        if not take:
+            result.append(Move(tuple(path), ()))
+            return
+        taken.append(take)
+        steps = self._get_steps(path[0], path[-1], taken)
+        if steps:
+            for submove in steps.values():
+                path.append(submove.pos)
+                self._find_moves(path, submove.take, taken, result)
+                path.pop()
+        else:
+            result.append(Move(tuple(path), tuple(taken)))
+        taken.pop()
+
+    def _piece(self, pos):
+        return self.pieces.get(pos)
+
+    def _may_start(self, start, priority):
+        # Whether a move of the given priority (see _first_steps) may
+        # start at `start`: only if no piece has a higher priority one.
+        # A capture needs an opponent's piece with an empty square behind
+        # it, right next to a man or at the end of a king's empty run.
+        if priority == 2:
+            return True
+        pieces = self.pieces
+        player = self.player
+        rays = self._geometry.rays
+        for pos, c in pieces.items():
+            if c.lower() != player or priority and c.islower():
+                continue
+            is_man = c.islower()
+            for (x_direction, y_direction), ray in rays[pos].items():
+                if is_man and y_direction != DIRS[player]:
+                    continue
+                for i, p in enumerate(ray):
+                    other = pieces.get(p)
+                    if other is None:
+                        if is_man:
+                            break
+                        continue
+                    if (other.lower() != player and i + 1 < len(ray)
+                            and ray[i + 1] not in pieces):
+                        return False
+                    break
+        return True
+
+    def _check_move(self, move):
+        # Validates a complete move in one walk along its path, and
+        # returns the squares it captures. Other pieces are only looked
+        # at to check that the move doesn't skip a mandatory capture.
+        if len(move) < 2 or move[0] not in self.valid_coords:
+            raise ValueError('bad move')
+        start = move[0]
+        piece = self._piece(start)
+        if piece is None or piece.lower() != self.player:
+            raise ValueError('bad move')
+        taken = []
+        steps = self._get_steps(start, start, taken)
+        for pos in move[1:]:
+            try:
+                submove = steps[pos]
+            except KeyError:
+                raise ValueError('bad move')
+            if submove.take:
+                taken.append(submove.take)
+                steps = self._get_steps(start, pos, taken)
+            else:
+                # A step without a capture ends the move
+                steps = {}
+        if steps:
+            raise ValueError('bad move')
+        if not taken:
+            priority = 0
+        elif piece.islower():
+            priority = 1
+        else:
+            priority = 2
+        if not self._may_start(start, priority):
+            raise ValueError('bad move')
+        return taken
+
     def make_move(self, move):
+        return self._apply_move(move, self._check_move(move))
+
+    def make_legal_move(self, move):
+        # Plays a Move from legal_moves(), which needs no checking
+        return self._apply_move(move.path, move.taken)
+
+    def _apply_move(self, move, taken):
         deleted = []
-        if not self.move_finished(move):
-            raise ValueError('bad move')
+        keys = self._zobrist.pieces
+        tables = self._geometry.eval_tables
         piece = self.pieces.pop(move[0])
-        prefix = [move[0]]
-        for coord in move[1:]:
-            f = self.get_submoves(prefix)[coord]
-            if f.take:
-                deleted.append(self.pieces.pop(f.take))
-            prefix += (coord,)
+        record = MoveRecord(tuple(move), piece, deleted, self.player)
+        self.hash ^= keys[piece][move[0]] ^ self._zobrist.player
+        terms = self.eval_terms - tables[piece][move[0]]
+        for pos in taken:
+            c = self.pieces.pop(pos)
+            deleted.append((pos, c))
+            self.hash ^= keys[c][pos]
+            terms -= tables[c][pos]
         if self.player == 'w':
             self.player = 'b'
             if move[-1][1] == self.size-1:
@@ -202,4 +668,41 @@ class Board:
             if move[-1][1] == 0:
                 piece = piece.upper()
         self.pieces[move[-1]] = piece
-        self._move_cache.clear()
+        self.hash ^= keys[piece][move[-1]]
+        self.eval_terms = terms + tables[piece][move[-1]]
+        return record
+
+    def unmake_move(self, record):
+        keys = self._zobrist.pieces
+        tables = self._geometry.eval_tables
+        start = record.path[0]
+        end = record.path[-1]
+        piece = self.pieces.pop(end)
+        self.hash ^= keys[piece][end] ^ self._zobrist.player
+        self.pieces[start] = record.piece
+        self.hash ^= keys[record.piece][start]
+        terms = (self.eval_terms - tables[piece][end]
+                 + tables[record.piece][start])
+        for pos, c in record.captured:
+            self.pieces[pos] = c
+            self.hash ^= keys[c][pos]
+            terms += tables[c][pos]
+        self.eval_terms = terms
+        self.player = record.player
+
+
+def openings(size, plies):
+    # Every sequence of `plies` legal moves from the starting position
+    result = []
+
+    def walk(board, path):
+        if len(path) == plies:
+            result.append(tuple(path))
+            return
+        for move in board.legal_moves():
+            record = board.make_move(move.path)
+            walk(board, path + [move.path])
+            board.unmake_move(record)
+
+    walk(Board(size=size), [])
+    return result
@@ -0,0 +1,214 @@
+import array
+import collections
+import mmap
+import os
+import struct
+import sys
+import time
+
+from dama.board import Board, get_geometry
+from dama import common
+from dama import pdn
+
+# File layout: header, then entries sorted by position hash (and by
+# decreasing weight for one position), then the paths of all entries as
+# little-endian uint16 square numbers (indices into Geometry.squares).
+# Scores are the average game result for the side to move, in permille.
+MAGIC = b'DAMABK1\0'
+HEADER = struct.Struct('<8sBI')
+ENTRY = struct.Struct('<QIIHH')
+HASH = struct.Struct('<Q')
+
+BookMove = collections.namedtuple('BookMove', ['path', 'weight', 'score'])
+
+
+class BookBuilder:
+    def __init__(self, size=8, max_plies=16):
+        self.size = size
+        self.max_plies = max_plies
+        self.games = 0
+        self.stats = {}
+
+    def add_game(self, paths, result='*'):
+        # Adds the first max_plies moves, stopping at an illegal one.
+        # Returns the number of moves added.
+        scores = pdn.SCORES.get(result, (0.5, 0.5))
+        board = Board(size=self.size)
+        added = 0
+        for path in paths[:self.max_plies]:
+            key = board.hash, tuple(path)
+            score = scores[board.player == 'b']
+            try:
+                board.make_move(path)
+            except ValueError:
+                break
+            entry = self.stats.setdefault(key, [0, 0])
+            entry[0] += 1
+            entry[1] += score
+            added += 1
+        self.games += 1
+        return added
+
+    def add_pdn(self, lines):
+        for game in pdn.read_games(lines):
+            try:
+                if pdn.game_size(game) != self.size:
+                    continue
+            except ValueError:
+                continue
+            paths = []
+            for text in game.moves[:self.max_plies]:
+                try:
+                    paths.append(pdn.parse_move(text))
+                except ValueError:
+                    break
+            self.add_game(paths, game.result)
+
+    def write(self, path):
+        index = get_geometry(self.size).index
+        entries = sorted(self.stats.items(),
+                         key=lambda item: (item[0][0], -item[1][0]))
+        squares = array.array('H')
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, self.size, len(entries)))
+            for (position, move), (weight, score) in entries:
+                f.write(ENTRY.pack(position, weight, len(squares), len(move),
+                                   round(score / weight * 1000)))
+                squares.extend(index[pos] for pos in move)
+            if sys.byteorder == 'big':
+                squares.byteswap()
+            f.write(squares.tobytes())
+        return len(entries)
+
+
+class Book:
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, size, count = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            raise ValueError('not an opening book file')
+        self.size = size
+        self.count = count
+        self.squares = get_geometry(size).squares
+        self._paths = HEADER.size + count * ENTRY.size
+        if len(self._mmap) < self._paths:
+            raise ValueError('bad opening book size')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._mmap.close()
+
+    def __len__(self):
+        return self.count
+
+    def _find(self, position):
+        # Index of the first entry whose hash is not less than `position`
+        lo = 0
+        hi = self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            [value] = HASH.unpack_from(
+                self._mmap, HEADER.size + mid * ENTRY.size)
+            if value < position:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def lookup(self, board):
+        if board.size != self.size:
+            return []
+        result = []
+        squares = self.squares
+        for i in range(self._find(board.hash), self.count):
+            position, weight, offset, length, score = ENTRY.unpack_from(
+                self._mmap, HEADER.size + i * ENTRY.size)
+            if position != board.hash:
+                break
+            start = self._paths + offset * 2
+            path = struct.unpack_from(f'<{length}H', self._mmap, start)
+            result.append(BookMove(tuple(squares[n] for n in path),
+                                   weight, score / 1000))
+        return result
+
+    def choose(self, board, rng=None):
+        # The most played legal move, or a random one weighted by how
+        # often it was played if `rng` is given
+        moves = self.lookup(board)
+        if not moves:
+            return None
+        legal = {move.path for move in board.legal_moves()}
+        moves = [move for move in moves if move.path in legal]
+        if not moves:
+            return None
+        if rng is not None:
+            return rng.choices(moves, [move.weight for move in moves])[0]
+        return max(moves, key=lambda move: (move.weight, move.score))
+
+
+def add_arguments(parser):
+    subparsers = parser.add_subparsers(dest='book_command', required=True)
+    build = subparsers.add_parser(
+        'build', help='build a book from PDN archives and/or self-play')
+    build.add_argument('path')
+    build.add_argument('--pdn', action='append', default=[],
+                       help='PDN archive to read (can be repeated)')
+    build.add_argument('--selfplay', type=int, default=0, metavar='GAMES',
+                       help='number of self-play games to add')
+    build.add_argument('--player', default='',
+                       help='self-play engine options, e.g. nodes=5000')
+    build.add_argument('--random-plies', type=int, default=0,
+                       help='random moves to play after each opening')
+    build.add_argument('--seed', type=int, default=0,
+                       help='seed for --random-plies')
+    build.add_argument('--plies', type=int, default=16,
+                       help='number of moves of each game to keep')
+    build.add_argument('--size', type=int, default=8)
+    build.add_argument('--workers', type=int, default=os.cpu_count())
+    build.set_defaults(func=build_main)
+    probe = subparsers.add_parser('probe', help='list book moves')
+    probe.add_argument('path')
+    probe.add_argument('--file', help='diagram to look up (- for stdin)')
+    probe.set_defaults(func=probe_main, size=8)
+
+
+def build_main(args):
+    # Only self-play needs the engines
+    from dama import tournament
+    start = time.perf_counter()
+    builder = BookBuilder(args.size, args.plies)
+    for path in args.pdn:
+        with open(path) as f:
+            builder.add_pdn(f)
+    if args.selfplay:
+        try:
+            player = tournament.parse_player(args.player, 'selfplay')
+        except ValueError as e:
+            print(e)
+            return 1
+        tournament.selfplay(builder, args.selfplay, player,
+                            workers=args.workers,
+                            random_plies=args.random_plies, seed=args.seed)
+    count = builder.write(args.path)
+    print(f'{count} entries from {builder.games} games'
+          + f' in {time.perf_counter() - start:.3f} s')
+    return 0
+
+
+def probe_main(args):
+    with Book(args.path) as book:
+        args.size = book.size
+        moves = book.lookup(common.board_from_args(args))
+    if not moves:
+        print('position not in book')
+        return 1
+    for move in moves:
+        name = '-'.join(common.coord_name(*pos) for pos in move.path)
+        print(f'{name} weight {move.weight} score {move.score:.3f}')
+    return 0
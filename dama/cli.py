@@ -1,21 +1,23 @@
-import string
+import argparse
+import sys
 
 from dama.board import Board
+from dama.common import coord_name, coord_from_name
+from dama import bench
+from dama import book
+from dama import engine
+from dama import instrument
+from dama import mcts
+from dama import parallel
+from dama import pdn
+from dama import perft
+from dama import server
+from dama import tablebase
+from dama import tournament
 
 PLAYER_NAMES = {'w': 'Bílý', 'b': 'Černý'}
 
 
-def coord_name(x, y):
-    assert x >= 0 and y >= 0
-    return string.ascii_lowercase[x] + string.digits[y+1]
-
-
-def coord_from_name(name):
-    col = name[0]
-    row = name[1:]
-    return string.ascii_lowercase.index(col), int(row) - 1
-
-
 def run():
     board = Board()
     while True:
@@ -51,3 +53,101 @@ def run():
         else:
             print(f'{name} nemá žádné další tahy')
             break
+
+
+def run_batch(lines, board, trace=None):
+    # Applies whole moves ("c3-d4", "e3xg5xe7"), separated by whitespace;
+    # move numbers like "12." are skipped. Returns the number of moves
+    # applied and the first bad move (None if all were fine).
+    ply = 0
+    for line in lines:
+        for text in line.split():
+            if pdn.MOVE_NUMBER_RE.match(text):
+                continue
+            try:
+                record = board.make_move(pdn.parse_move(text))
+            except ValueError:
+                return ply, text
+            if bool(record.captured) != ('x' in text):
+                board.unmake_move(record)
+                return ply, text
+            ply += 1
+            if trace is not None:
+                trace.write(f'{ply} {text} {board.hash:016x}\n')
+    return ply, None
+
+
+def batch_main(args):
+    if args.start:
+        with open(args.start) as f:
+            board = Board.load(f.read())
+    else:
+        board = Board(size=args.size)
+    trace = sys.stdout if args.trace else None
+    if args.batch == '-':
+        ply, error = run_batch(sys.stdin, board, trace)
+    else:
+        with open(args.batch) as f:
+            ply, error = run_batch(f, board, trace)
+    if args.show:
+        print(board.dump())
+    if error is not None:
+        print(f'illegal move {ply + 1}: {error}', file=sys.stderr)
+        return 1
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m dama')
+    parser.add_argument('--instrument', choices=['text', 'json'],
+                        help='count and time move generation in this'
+                        + ' process, and print a report at the end')
+    parser.add_argument('--batch', metavar='FILE',
+                        help='apply the moves in FILE (- for stdin)'
+                        + ' instead of playing interactively')
+    parser.add_argument('--size', type=int, default=8,
+                        help='board size for --batch')
+    parser.add_argument('--start', metavar='FILE',
+                        help='diagram to start --batch from')
+    parser.add_argument('--trace', action='store_true',
+                        help='with --batch, print each move and position hash')
+    parser.add_argument('--show', action='store_true',
+                        help='with --batch, print the final board')
+    subparsers = parser.add_subparsers(dest='command')
+    perft.add_arguments(subparsers.add_parser(
+        'perft', help='count move tree leaves and measure move generation'))
+    engine.add_arguments(subparsers.add_parser(
+        'search', help='search for the best move'))
+    parallel.add_arguments(subparsers.add_parser(
+        'parallel', help='compare parallel search speed across worker counts'))
+    pdn.add_arguments(subparsers.add_parser(
+        'pdn', help='validate a PDN game archive'))
+    bench.add_arguments(subparsers.add_parser(
+        'bench', help='run micro-benchmarks'))
+    tablebase.add_arguments(subparsers.add_parser(
+        'tablebase', help='build or probe endgame tablebases'))
+    server.add_arguments(subparsers.add_parser(
+        'serve', help='host games over a TCP line protocol'))
+    tournament.add_arguments(subparsers.add_parser(
+        'tournament', help='play engine-versus-engine games'))
+    book.add_arguments(subparsers.add_parser(
+        'book', help='build or probe opening books'))
+    mcts.add_arguments(subparsers.add_parser(
+        'mcts', help='search for the best move with Monte Carlo tree search'))
+    args = parser.parse_args(argv)
+    if args.batch and args.command:
+        parser.error('--batch cannot be used with a command')
+    if args.instrument:
+        instrument.reset()
+        instrument.enable()
+    try:
+        if args.batch:
+            return batch_main(args)
+        elif args.command is None:
+            run()
+            return 0
+        return args.func(args)
+    finally:
+        if args.instrument:
+            instrument.disable()
+            instrument.dump(args.instrument)
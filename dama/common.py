@@ -0,0 +1,28 @@
+import string
+import sys
+
+from dama.board import Board
+
+# coord_name() has letters for files a to z only
+MAX_SIZE = 26
+
+
+def coord_name(x, y):
+    assert x >= 0 and y >= 0
+    return string.ascii_lowercase[x] + str(y + 1)
+
+
+def coord_from_name(name):
+    col = name[0]
+    row = name[1:]
+    return string.ascii_lowercase.index(col), int(row) - 1
+
+
+def board_from_args(args, board_class=Board):
+    if args.file == '-':
+        return board_class.load(sys.stdin.read())
+    elif args.file:
+        with open(args.file) as f:
+            return board_class.load(f.read())
+    else:
+        return board_class(size=args.size)
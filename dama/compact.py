@@ -0,0 +1,213 @@
+import collections
+import functools
+
+from dama.board import Board, MoveCache, SubMove, MoveRecord, DIRS
+from dama.board import PIECE_CODES, PIECE_SYMBOLS, encoded_size
+from dama.board import get_geometry, get_zobrist_keys, get_eval_tables
+
+# Cells hold PIECE_CODES, one per playable square in Geometry.squares order
+OWNERS = (None, 'w', 'b', 'w', 'b')
+KING_CODE = 3
+
+CompactGeometry = collections.namedtuple(
+    'CompactGeometry', ['rays', 'start', 'last_rows', 'keys', 'eval_tables'])
+
+
+@functools.lru_cache()
+def get_compact_geometry(size):
+    geometry = get_geometry(size)
+    index = geometry.index
+    rays = []
+    for pos in geometry.squares:
+        rays.append({direction: tuple(index[p] for p in ray)
+                     for direction, ray in geometry.rays[pos].items()})
+    start = bytearray(len(geometry.squares))
+    for pos, c in geometry.start.items():
+        start[index[pos]] = PIECE_CODES[c]
+    last_rows = {
+        'w': frozenset(i for i, (x, y) in enumerate(geometry.squares)
+                       if y == size - 1),
+        'b': frozenset(i for i, (x, y) in enumerate(geometry.squares)
+                       if y == 0),
+    }
+    # Zobrist keys indexed [code][cell]
+    zobrist = get_zobrist_keys(size).pieces
+    keys = [None] + [tuple(zobrist[c][pos] for pos in geometry.squares)
+                     for c in PIECE_SYMBOLS[1:]]
+    # Evaluation term tables, indexed the same way
+    tables = get_eval_tables(size)
+    eval_tables = [None] + [tuple(tables[c][pos] for pos in geometry.squares)
+                            for c in PIECE_SYMBOLS[1:]]
+    return CompactGeometry(
+        rays=tuple(rays),
+        start=bytes(start),
+        last_rows=last_rows,
+        keys=tuple(keys),
+        eval_tables=tuple(eval_tables),
+    )
+
+
+class CompactBoard(Board):
+    # Board with no per-instance dicts: the pieces are a bytearray of
+    # PIECE_CODES, everything else is shared between boards of one size.
+    __slots__ = ('cells', '_compact')
+
+    def __init__(self, size=8, move_cache=None, pieces=None, player='w'):
+        self.size = size
+        self.player = player
+        if move_cache is None:
+            move_cache = MoveCache()
+        self._move_cache = move_cache
+        self._zobrist = get_zobrist_keys(size)
+        self._geometry = get_geometry(size)
+        self._compact = get_compact_geometry(size)
+        self.valid_coords = self._geometry.valid_coords
+        if pieces is None:
+            self.cells = bytearray(self._compact.start)
+            self.hash = self._geometry.start_hash
+            if player == 'b':
+                self.hash ^= self._zobrist.player
+            self.eval_terms = self._geometry.start_terms
+        else:
+            self.cells = bytearray(len(self._geometry.squares))
+            index = self._geometry.index
+            for pos, c in pieces.items():
+                self.cells[index[pos]] = PIECE_CODES[c]
+            self.hash = self.compute_hash()
+            self.eval_terms = self.compute_eval_terms()
+
+    @classmethod
+    def from_board(cls, board, move_cache=None):
+        return cls(size=board.size, move_cache=move_cache,
+                   pieces=board.pieces, player=board.player)
+
+    def clone(self):
+        new = object.__new__(type(self))
+        new.size = self.size
+        new.player = self.player
+        new._move_cache = self._move_cache
+        new._zobrist = self._zobrist
+        new._geometry = self._geometry
+        new._compact = self._compact
+        new.valid_coords = self.valid_coords
+        new.cells = self.cells[:]
+        new.hash = self.hash
+        new.eval_terms = self.eval_terms
+        return new
+
+    @property
+    def pieces(self):
+        squares = self._geometry.squares
+        return {squares[i]: PIECE_SYMBOLS[code]
+                for i, code in enumerate(self.cells) if code}
+
+    def to_bytes(self):
+        value = 0
+        for code in reversed(self.cells):
+            value = value * 5 + code
+        value = value * 2 + (self.player == 'b')
+        return bytes([self.size]) + value.to_bytes(
+            encoded_size(self.size) - 1, 'little')
+
+    def _piece(self, pos):
+        code = self.cells[self._geometry.index[pos]]
+        return PIECE_SYMBOLS[code] if code else None
+
+    def _get_steps(self, start, pos, jumped):
+        result = {}
+        cells = self.cells
+        index = self._geometry.index
+        squares = self._geometry.squares
+        player = self.player
+        origin = index[start]
+        is_man = cells[origin] < KING_CODE
+        removed = {index[p] for p in jumped}
+        jumping = bool(removed)
+        removed.add(origin)
+        if is_man:
+            y_dirs = [DIRS[player]]
+        else:
+            y_dirs = -1, 1
+        rays = self._compact.rays[index[pos]]
+        for x_direction in -1, 1:
+            for y_direction in y_dirs:
+                taken = None
+                for i in rays[x_direction, y_direction]:
+                    code = cells[i]
+                    if not code or i == origin:
+                        if taken in removed:
+                            break
+                        if taken is not None and not jumping:
+                            jumping = True
+                            result.clear()
+                        if taken is None and jumping:
+                            if is_man:
+                                break
+                            continue
+                        result[squares[i]] = SubMove(
+                            squares[i],
+                            None if taken is None else squares[taken])
+                    elif OWNERS[code] == player:
+                        break
+                    elif taken is None:
+                        taken = i
+                        continue
+                    else:
+                        break
+                    if is_man:
+                        break
+        return result
+
+    def _apply_move(self, move, jumped):
+        cells = self.cells
+        index = self._geometry.index
+        keys = self._compact.keys
+        tables = self._compact.eval_tables
+        start = index[move[0]]
+        end = index[move[-1]]
+        code = cells[start]
+        captured = []
+        terms = self.eval_terms
+        for pos in jumped:
+            i = index[pos]
+            c = cells[i]
+            cells[i] = 0
+            self.hash ^= keys[c][i]
+            terms -= tables[c][i]
+            captured.append((pos, PIECE_SYMBOLS[c]))
+        cells[start] = 0
+        self.hash ^= keys[code][start] ^ self._zobrist.player
+        terms -= tables[code][start]
+        record = MoveRecord(tuple(move), PIECE_SYMBOLS[code], captured,
+                            self.player)
+        if code < KING_CODE and end in self._compact.last_rows[self.player]:
+            code += 2
+        self.player = 'b' if self.player == 'w' else 'w'
+        cells[end] = code
+        self.hash ^= keys[code][end]
+        self.eval_terms = terms + tables[code][end]
+        return record
+
+    def unmake_move(self, record):
+        cells = self.cells
+        index = self._geometry.index
+        keys = self._compact.keys
+        tables = self._compact.eval_tables
+        start = index[record.path[0]]
+        end = index[record.path[-1]]
+        code = cells[end]
+        self.hash ^= keys[code][end] ^ self._zobrist.player
+        terms = self.eval_terms - tables[code][end]
+        cells[end] = 0
+        code = PIECE_CODES[record.piece]
+        cells[start] = code
+        self.hash ^= keys[code][start]
+        terms += tables[code][start]
+        for pos, c in record.captured:
+            i = index[pos]
+            code = PIECE_CODES[c]
+            cells[i] = code
+            self.hash ^= keys[code][i]
+            terms += tables[code][i]
+        self.eval_terms = terms
+        self.player = record.player
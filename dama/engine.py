@@ -0,0 +1,296 @@
+import collections
+import time
+
+from dama import common
+
+WIN = 1000000
+MAX_DEPTH = 100
+PIECE_VALUES = {'w': 100, 'b': 100, 'W': 300, 'B': 300}
+ADVANCE_VALUE = 2
+CENTER_VALUE = 4
+BACK_RANK_VALUE = 5
+
+EXACT, LOWER, UPPER = range(3)
+
+TableEntry = collections.namedtuple(
+    'TableEntry', ['depth', 'score', 'flag', 'move'])
+
+
+class SearchResult(collections.namedtuple(
+        'SearchResult', ['move', 'score', 'depth', 'nodes', 'elapsed'])):
+    @property
+    def nps(self):
+        if not self.elapsed:
+            return 0
+        return self.nodes / self.elapsed
+
+
+class SearchAborted(Exception):
+    pass
+
+
+def evaluate(board, piece_values=PIECE_VALUES, advance_value=ADVANCE_VALUE,
+             center_value=CENTER_VALUE, back_rank_value=BACK_RANK_VALUE):
+    # Uses the terms that make_move keeps up to date
+    (white_men, black_men, white_kings, black_kings,
+     advance, center, back_rank) = board.terms
+    score = (white_men * piece_values['w'] - black_men * piece_values['b']
+             + white_kings * piece_values['W']
+             - black_kings * piece_values['B']
+             + advance * advance_value
+             + center * center_value
+             + back_rank * back_rank_value)
+    if board.player == 'w':
+        return score
+    else:
+        return -score
+
+
+def evaluate_from_scratch(board, piece_values=PIECE_VALUES,
+                          advance_value=ADVANCE_VALUE,
+                          center_value=CENTER_VALUE,
+                          back_rank_value=BACK_RANK_VALUE):
+    # Same as evaluate(), computed from the pieces alone
+    score = 0
+    top = board.size - 1
+    low = board.size // 4
+    high = board.size - low
+    for (x, y), c in board.pieces.items():
+        value = piece_values[c]
+        if low <= x < high and low <= y < high:
+            value += center_value
+        if c == 'w':
+            value += y * advance_value + (y == 0) * back_rank_value
+        elif c == 'b':
+            value += (top - y) * advance_value + (y == top) * back_rank_value
+        if c in 'wW':
+            score += value
+        else:
+            score -= value
+    if board.player == 'w':
+        return score
+    else:
+        return -score
+
+
+def _to_table(score, ply):
+    if score > WIN - MAX_DEPTH * 2:
+        return score + ply
+    elif score < -WIN + MAX_DEPTH * 2:
+        return score - ply
+    return score
+
+
+def _from_table(score, ply):
+    if score > WIN - MAX_DEPTH * 2:
+        return score - ply
+    elif score < -WIN + MAX_DEPTH * 2:
+        return score + ply
+    return score
+
+
+class Engine:
+    def __init__(self, table_size=1000000, evaluate=evaluate,
+                 tablebase=None, book=None):
+        self.table_size = table_size
+        self.tablebase = tablebase
+        self.book = book
+        self.table = {}
+        self.history = collections.Counter()
+        self.evaluate = evaluate
+        self.nodes = 0
+
+    def search(self, board, depth=MAX_DEPTH, time_limit=None,
+               node_limit=None, callback=None, stop=None):
+        # `stop` is an optional function; the search ends (like at a time
+        # limit) as soon as it returns true.
+        start = time.perf_counter()
+        if self.book is not None:
+            book_move = self.book.choose(board)
+            if book_move is not None:
+                result = SearchResult(book_move.path, 0, 0, 0,
+                                      time.perf_counter() - start)
+                if callback:
+                    callback(result)
+                return result
+        self._start(time_limit, node_limit, stop)
+        result = SearchResult(None, -WIN, 0, 0, 0)
+        for d in range(1, depth + 1):
+            self._can_abort = result.move is not None
+            try:
+                score = self._negamax(board, d, -WIN - 1, WIN + 1, 0)
+            except SearchAborted:
+                break
+            entry = self.table.get(board.hash)
+            move = entry.move if entry else None
+            result = SearchResult(move, score, d, self.nodes,
+                                  time.perf_counter() - start)
+            if callback:
+                callback(result)
+            if move is None or abs(score) > WIN - MAX_DEPTH * 2:
+                break
+        return result._replace(nodes=self.nodes,
+                               elapsed=time.perf_counter() - start)
+
+    def score(self, board, depth, ply=0):
+        # Exact score at a fixed depth, with no limits; `ply` is the distance
+        # from the root, which offsets win/loss scores.
+        self._start(None, None)
+        self._can_abort = False
+        for d in range(min(depth, 1), depth + 1):
+            score = self._negamax(board, d, -WIN - 1, WIN + 1, ply)
+        return score
+
+    def _start(self, time_limit, node_limit, stop=None):
+        self.nodes = 0
+        if time_limit is None:
+            self._deadline = None
+        else:
+            self._deadline = time.perf_counter() + time_limit
+        self._node_limit = node_limit
+        self._stop = stop
+        self._killers = collections.defaultdict(list)
+        for key in self.history:
+            self.history[key] //= 2
+
+    def _check_limits(self):
+        if not self._can_abort:
+            return
+        if self._node_limit is not None and self.nodes >= self._node_limit:
+            raise SearchAborted()
+        if (self._deadline is not None
+                and time.perf_counter() >= self._deadline):
+            raise SearchAborted()
+        if self._stop is not None and self._stop():
+            raise SearchAborted()
+
+    def _order_moves(self, moves, table_move, ply):
+        killers = self._killers[ply]
+        history = self.history
+
+        def key(move):
+            if move.path == table_move:
+                return (3, 0, 0)
+            return (len(move.taken), move.path in killers,
+                    history[move.path])
+
+        moves.sort(key=key, reverse=True)
+
+    def _negamax(self, board, depth, alpha, beta, ply):
+        self.nodes += 1
+        if not self.nodes & 1023:
+            self._check_limits()
+
+        if self.tablebase is not None and ply:
+            probed = self.tablebase.probe(board)
+            if probed is None:
+                pass
+            elif probed.result == 'win':
+                return WIN - ply - probed.distance
+            elif probed.result == 'loss':
+                return -WIN + ply + probed.distance
+            else:
+                return 0
+
+        # Captures that only differ in the landing squares between
+        # captures end in the same position, so only one is searched
+        moves = board.legal_moves(grouped=True)
+        if not moves:
+            return -WIN + ply
+        if depth <= 0 and not moves[0].taken or ply >= MAX_DEPTH:
+            return self.evaluate(board)
+
+        original_alpha = alpha
+        entry = self.table.get(board.hash)
+        table_move = None
+        if entry is not None:
+            table_move = entry.move
+            if entry.depth >= depth:
+                score = _from_table(entry.score, ply)
+                if entry.flag == EXACT:
+                    return score
+                elif entry.flag == LOWER:
+                    alpha = max(alpha, score)
+                else:
+                    beta = min(beta, score)
+                if alpha >= beta:
+                    return score
+
+        self._order_moves(moves, table_move, ply)
+        best_score = -WIN - 1
+        best_move = None
+        for move in moves:
+            record = board.make_legal_move(move)
+            try:
+                score = -self._negamax(board, depth - 1, -beta, -alpha,
+                                       ply + 1)
+            finally:
+                board.unmake_move(record)
+            if score > best_score:
+                best_score = score
+                best_move = move.path
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                if not move.taken:
+                    killers = self._killers[ply]
+                    if move.path not in killers:
+                        killers.insert(0, move.path)
+                        del killers[2:]
+                    self.history[move.path] += depth * depth
+                break
+
+        if best_score <= original_alpha:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        if len(self.table) >= self.table_size:
+            self.table.clear()
+        self.table[board.hash] = TableEntry(
+            max(depth, 0), _to_table(best_score, ply), flag, best_move)
+        return best_score
+
+
+def add_arguments(parser):
+    parser.add_argument('--depth', type=int, default=MAX_DEPTH)
+    parser.add_argument('--time', type=float, help='time limit in seconds')
+    parser.add_argument('--nodes', type=int, help='node limit')
+    parser.add_argument('--size', type=int, default=8,
+                        help='board size for the starting position')
+    parser.add_argument('--file', help='diagram to start from (- for stdin)')
+    parser.add_argument('--tablebase', help='endgame tablebase file')
+    parser.add_argument('--book', help='opening book file')
+    parser.set_defaults(func=main)
+
+
+def print_result(result, file=None):
+    if result.move:
+        move = '-'.join(common.coord_name(*pos) for pos in result.move)
+    else:
+        move = '(none)'
+    print(f'depth {result.depth}: {move} score {result.score}'
+          + f' nodes {result.nodes} ({result.elapsed:.3f} s,'
+          + f' {result.nps:.0f} nodes/s)', file=file)
+
+
+def main(args):
+    # Engine itself only calls probe() and choose() on the objects given
+    from dama import book
+    from dama import tablebase
+    board = common.board_from_args(args)
+    if args.depth == MAX_DEPTH and args.time is None and args.nodes is None:
+        args.time = 5
+    if args.tablebase:
+        table = tablebase.Tablebase(args.tablebase)
+    else:
+        table = None
+    if args.book:
+        opening_book = book.Book(args.book)
+    else:
+        opening_book = None
+    Engine(tablebase=table, book=opening_book).search(
+        board, depth=args.depth, time_limit=args.time,
+        node_limit=args.nodes, callback=print_result)
+    return 0
@@ -1,6 +1,10 @@
+import argparse
+import contextlib
 import os
+import time
 
 from dama.board import Board
+from dama.thinker import BackgroundEngine
 
 import pyglet
 
@@ -30,8 +34,51 @@ piece_images = {
     None: img_empty,
 }
 
+SHINE_OFF = None
+SHINE_HOVERED = (255, 255, 255), 255, 1.3
+SHINE_POSSIBLE = (255, 255, 255), 200, 1
+SHINE_MOVE = (255, 231, 107), 255, 1
+SHINE_JUMPED = (255, 100, 100), 200, 0.8
 
-def make_window(board=None):
+
+class FrameTimer:
+    # Wall-clock and CPU time spent drawing and handling events,
+    # reported periodically when the GUI runs with DAMA_GUI_STATS set
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.frames = 0
+        self.events = 0
+        self.wall = 0
+        self.cpu = 0
+        self.started = time.perf_counter()
+
+    @contextlib.contextmanager
+    def measure(self, frame=False):
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            self.wall += time.perf_counter() - wall
+            self.cpu += time.process_time() - cpu
+            if frame:
+                self.frames += 1
+            else:
+                self.events += 1
+
+    def report(self, dt=None, file=None):
+        elapsed = time.perf_counter() - self.started
+        frames = self.frames or 1
+        print(f'{self.frames / elapsed:.1f} fps, {self.events} events,'
+              + f' {self.wall / frames * 1000:.3f} ms/frame,'
+              + f' {self.cpu / frames * 1000:.3f} ms CPU/frame', file=file)
+        self.reset()
+
+
+def make_window(board=None, timer=None, computer=None, think_time=2,
+                book_path=None):
     window_style = getattr(
         pyglet.window.Window,
         'WINDOW_STYLE_' + os.environ.get('GAME_WINDOW_STYLE', 'DEFAULT'),
@@ -47,6 +94,21 @@ def make_window(board=None):
 
     hovered_tile = None
 
+    # Moves possible after the current prefix and the pieces it jumps,
+    # recomputed only when the position or the prefix changes
+    prefix_state = None
+    # Shine style of every sprite that is currently lit
+    shine_styles = {}
+    marked = set()
+    timer = timer or FrameTimer()
+
+    # The computer plays `computer` ('w' or 'b') in a background process;
+    # its moves are picked up by a function scheduled on the pyglet clock
+    if computer is None:
+        thinker = None
+    else:
+        thinker = BackgroundEngine(think_time, book_path)
+
     bg_batch = pyglet.graphics.Batch()
     bg_sprites = {}
     piece_batch = pyglet.graphics.Batch()
@@ -87,47 +149,60 @@ def make_window(board=None):
         return ((x - 1/2) * tile_size + start_x,
                 (y - 1/2) * tile_size + start_y)
 
-    def reset_piece_sprites():
-        for (x, y), sprite in piece_sprites.items():
-            sprite.image = piece_images[board.pieces.get((x, y))]
+    def update_piece_sprites(positions):
+        pieces = board.pieces
+        for pos in positions:
+            piece_sprites[pos].image = piece_images[pieces.get(pos)]
+
+    def get_prefix_state():
+        nonlocal prefix_state
+        key = board.hash, tuple(move)
+        if prefix_state is None or prefix_state[0] != key:
+            prefix_state = (key, set(board.possible_moves(move)),
+                            set(board.get_jumped(move)))
+        return prefix_state[1:]
+
+    def shine_style(pos, possible_moves, jumped):
+        if pos in possible_moves:
+            if pos == hovered_tile:
+                return SHINE_HOVERED
+            return SHINE_POSSIBLE
+        elif pos in move:
+            return SHINE_MOVE
+        elif pos in jumped:
+            return SHINE_JUMPED
+        return SHINE_OFF
 
     def shine():
-        possible_moves = board.possible_moves(move)
-        jumped = set(board.get_jumped(move))
-        for pos, sprite in shine_sprites.items():
-            if pos in possible_moves:
-                if pos == hovered_tile:
-                    sprite.color = 255, 255, 255
-                    sprite.opacity = 255
-                    sprite.scale = 1.3
-                else:
-                    sprite.color = 255, 255, 255
-                    sprite.opacity = 200
-                    sprite.scale = 1
-            elif pos in move:
-                sprite.color = 255, 231, 107
-                sprite.opacity = 255
-                sprite.scale = 1
-            elif pos in jumped:
-                sprite.color = 255, 100, 100
-                sprite.opacity = 200
-                sprite.scale = 0.8
-            else:
+        possible_moves, jumped = get_prefix_state()
+        candidates = set(shine_styles) | possible_moves | set(move) | jumped
+        for pos in candidates:
+            style = shine_style(pos, possible_moves, jumped)
+            if shine_styles.get(pos) == style:
+                continue
+            sprite = shine_sprites[pos]
+            if style is SHINE_OFF:
+                del shine_styles[pos]
                 sprite.opacity = 0
                 sprite.scale = 0
-        for pos, sprite in mark_sprites.items():
-            if pos in jumped:
-                sprite.opacity = 255
             else:
-                sprite.opacity = 0
+                shine_styles[pos] = style
+                sprite.color, sprite.opacity, sprite.scale = style
+        for pos in marked - jumped:
+            mark_sprites[pos].opacity = 0
+        for pos in jumped - marked:
+            mark_sprites[pos].opacity = 255
+        marked.clear()
+        marked.update(jumped)
 
     @window.event
     def on_draw():
-        window.clear()
-        bg_batch.draw()
-        shine_batch.draw()
-        piece_batch.draw()
-        mark_batch.draw()
+        with timer.measure(frame=True):
+            window.clear()
+            bg_batch.draw()
+            shine_batch.draw()
+            piece_batch.draw()
+            mark_batch.draw()
 
     @window.event
     def on_resize(w, h):
@@ -137,39 +212,100 @@ def make_window(board=None):
                 sprite.x = start_x + x * tile_size
                 sprite.y = start_y + y * tile_size
                 sprite.scale = tile_size / sprite.image.width
+        shine_styles.clear()
+        marked.clear()
+        for pos in shine_sprites:
+            shine_sprites[pos].opacity = 0
+            shine_sprites[pos].scale = 0
+            mark_sprites[pos].opacity = 0
         shine()
 
     @window.event
     def on_mouse_motion(mx, my, dx, dy):
         nonlocal hovered_tile
         x, y = mouse_to_logical(mx, my)
-        hovered_tile = int(x), int(y)
+        pos = int(x), int(y)
+        if pos == hovered_tile:
+            return
+        with timer.measure():
+            hovered_tile = pos
+            shine()
+
+    def finish_move(path):
+        record = board.make_move(path)
+        move.clear()
+        print(board.dump())
+        update_piece_sprites(
+            record.path + tuple(pos for pos, c in record.captured))
+        if board.player == computer:
+            thinker.think(board)
+
+    def poll_thinker(dt):
+        result = thinker.poll()
+        if result is None:
+            return
+        search_result, reply = result
+        if search_result.move is None:
+            return
+        print(f'depth {search_result.depth}, score {search_result.score},'
+              + f' {search_result.nps:.0f} nodes/s,'
+              + f' ponder hits {thinker.ponder_hits}'
+              + f' misses {thinker.ponder_misses}')
+        finish_move(search_result.move)
+        if reply is not None and board.player != computer:
+            thinker.ponder(board, reply)
         shine()
 
     @window.event
     def on_mouse_press(mx, my, btn, mod):
-        nonlocal hovered_tile
-        x, y = mouse_to_logical(mx, my)
-        pos = int(x), int(y)
-        if pos in board.possible_moves(move):
-            move.append(pos)
-        elif pos in move:
-            while pos in move:
-                move.pop()
-        else:
-            print('nope')
-        if move and not board.possible_moves(move):
-            board.make_move(move)
-            move.clear()
-            print(board.dump())
-            reset_piece_sprites()
-        shine()
+        if board.player == computer:
+            return
+        with timer.measure():
+            x, y = mouse_to_logical(mx, my)
+            pos = int(x), int(y)
+            possible_moves, jumped = get_prefix_state()
+            if pos in possible_moves:
+                move.append(pos)
+            elif pos in move:
+                while pos in move:
+                    move.pop()
+            else:
+                print('nope')
+            if move and not get_prefix_state()[0]:
+                finish_move(move)
+            shine()
+
+    @window.event
+    def on_close():
+        if thinker is not None:
+            pyglet.clock.unschedule(poll_thinker)
+            thinker.close()
+
+    if thinker is not None:
+        pyglet.clock.schedule_interval(poll_thinker, 1/30)
+        if board.player == computer:
+            thinker.think(board)
+
+    return window
 
 
-def run(board=None):
-    make_window(board=board)
+def run(board=None, computer=None, think_time=2, book_path=None):
+    timer = FrameTimer()
+    make_window(board=board, timer=timer, computer=computer,
+                think_time=think_time, book_path=book_path)
+    if os.environ.get('DAMA_GUI_STATS'):
+        pyglet.clock.schedule_interval(timer.report, 5)
     pyglet.app.run()
 
 
 if __name__ == '__main__':
-    run()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('size', type=int, nargs='?', default=8)
+    parser.add_argument('--computer', choices=['w', 'b'],
+                        help='let the computer play this side')
+    parser.add_argument('--time', type=float, default=2,
+                        help='computer thinking time in seconds')
+    parser.add_argument('--book', help='opening book for the computer')
+    args = parser.parse_args()
+    run(Board(size=args.size), computer=args.computer, think_time=args.time,
+        book_path=args.book)
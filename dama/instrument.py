@@ -0,0 +1,141 @@
+import collections
+import contextlib
+import functools
+import json
+import time
+
+from dama.board import Board, MoveCache
+
+# Optional counters and timers for the move generator's hot paths.
+# enable() replaces the methods below on Board and all its subclasses
+# with counting wrappers and disable() puts the originals back, so
+# the instrumentation costs nothing while it is off.
+# Only the current process is measured.
+
+METHODS = ['_get_submoves', '_get_steps', 'get_jumped', '_check_move',
+           'make_move', '_apply_move']
+
+calls = collections.Counter()
+seconds = collections.Counter()
+prefix_lengths = collections.Counter()
+cache_hits = 0
+cache_misses = 0
+
+_depth = collections.Counter()
+_originals = {}
+
+
+def _subclasses(cls):
+    yield cls
+    for subclass in cls.__subclasses__():
+        yield from _subclasses(subclass)
+
+
+def _wrap(name, func):
+    @functools.wraps(func)
+    def wrapper(self, *args):
+        if getattr(type(self), name) is not wrapper:
+            # Called through super() from an override that's counted
+            return func(self, *args)
+        calls[name] += 1
+        if name == '_get_submoves':
+            prefix_lengths[len(args[0])] += 1
+        _depth[name] += 1
+        start = time.perf_counter()
+        try:
+            return func(self, *args)
+        finally:
+            _depth[name] -= 1
+            if not _depth[name]:
+                seconds[name] += time.perf_counter() - start
+    return wrapper
+
+
+def _wrap_cache_lookup(func):
+    @functools.wraps(func)
+    def wrapper(self, key):
+        global cache_hits, cache_misses
+        try:
+            value = func(self, key)
+        except KeyError:
+            cache_misses += 1
+            raise
+        cache_hits += 1
+        return value
+    return wrapper
+
+
+def is_enabled():
+    return bool(_originals)
+
+
+def enable():
+    if is_enabled():
+        return
+    for cls in _subclasses(Board):
+        for name in METHODS:
+            if name in vars(cls):
+                func = vars(cls)[name]
+                _originals[cls, name] = func
+                setattr(cls, name, _wrap(name, func))
+    func = MoveCache.__getitem__
+    _originals[MoveCache, '__getitem__'] = func
+    MoveCache.__getitem__ = _wrap_cache_lookup(func)
+
+
+def disable():
+    for (cls, name), func in _originals.items():
+        setattr(cls, name, func)
+    _originals.clear()
+    _depth.clear()
+
+
+def reset():
+    global cache_hits, cache_misses
+    calls.clear()
+    seconds.clear()
+    prefix_lengths.clear()
+    cache_hits = cache_misses = 0
+
+
+@contextlib.contextmanager
+def instrumented():
+    enable()
+    try:
+        yield
+    finally:
+        disable()
+
+
+def report():
+    return {
+        'calls': {name: calls[name] for name in METHODS},
+        'seconds': {name: seconds[name] for name in METHODS},
+        'submoves_by_prefix_length': {
+            str(n): prefix_lengths[n] for n in sorted(prefix_lengths)},
+        'move_cache': {'hits': cache_hits, 'misses': cache_misses},
+    }
+
+
+def format_report(data):
+    lines = [f'{"method":16}{"calls":>12}{"seconds":>12}{"us/call":>10}']
+    for name, count in data['calls'].items():
+        total = data['seconds'][name]
+        per_call = total / count * 1e6 if count else 0
+        lines.append(f'{name:16}{count:12}{total:12.3f}{per_call:10.2f}')
+    lengths = ', '.join(f'{n}: {count}' for n, count
+                        in data['submoves_by_prefix_length'].items())
+    lines.append(f'_get_submoves by prefix length: {lengths or "-"}')
+    hits = data['move_cache']['hits']
+    misses = data['move_cache']['misses']
+    rate = hits / (hits + misses) * 100 if hits + misses else 0
+    lines.append(f'move cache: {hits} hits, {misses} misses'
+                 + f' ({rate:.1f}% hit rate)')
+    return '\n'.join(lines)
+
+
+def dump(format='text', file=None):
+    if format == 'json':
+        print(json.dumps(report(), indent=2), file=file)
+    else:
+        print(format_report(report()), file=file)
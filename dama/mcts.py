@@ -0,0 +1,321 @@
+import array
+import collections
+import concurrent.futures
+import math
+import random
+import sys
+import time
+
+from dama.board import Board, Move, get_geometry
+from dama import common
+from dama import engine
+
+EXPLORATION = 1.4
+MAX_PLAYOUT_PLIES = 200
+# Unfinished playouts count as a win for whoever is this far ahead
+PLAYOUT_MARGIN = 100
+DEFAULT_PLAYOUTS = 1000
+
+
+class MCTSResult(collections.namedtuple(
+        'MCTSResult', ['move', 'win_rate', 'playouts', 'tree_nodes',
+                       'tree_bytes', 'elapsed'])):
+    # `nodes` and `nps` make results usable where SearchResults are
+    @property
+    def nodes(self):
+        return self.playouts
+
+    @property
+    def nps(self):
+        if not self.elapsed:
+            return 0
+        return self.playouts / self.elapsed
+
+
+class Tree:
+    # Node statistics in flat arrays indexed by node number; node 0 is
+    # the root. The children of a node are consecutive, starting at
+    # first_child (-1 until the node is expanded). The move leading to
+    # a node is kept in `moves`, its path followed by the captured
+    # squares, as indices into Geometry.squares.
+    def __init__(self, size):
+        geometry = get_geometry(size)
+        self.squares = geometry.squares
+        self.index = geometry.index
+        self.parent = array.array('q')
+        self.first_child = array.array('q')
+        self.child_count = array.array('l')
+        self.visits = array.array('q')
+        self.wins = array.array('d')
+        self.move_start = array.array('q')
+        self.move_length = array.array('H')
+        self.taken_length = array.array('H')
+        self.moves = array.array('H')
+        self._add(-1, Move((), ()))
+
+    def __len__(self):
+        return len(self.parent)
+
+    def _add(self, parent, move):
+        self.parent.append(parent)
+        self.first_child.append(-1)
+        self.child_count.append(0)
+        self.visits.append(0)
+        self.wins.append(0)
+        self.move_start.append(len(self.moves))
+        self.move_length.append(len(move.path))
+        self.taken_length.append(len(move.taken))
+        self.moves.extend(self.index[pos] for pos in move.path)
+        self.moves.extend(self.index[pos] for pos in move.taken)
+
+    def expand(self, node, moves):
+        # `moves` are Moves from legal_moves()
+        self.first_child[node] = len(self)
+        self.child_count[node] = len(moves)
+        for move in moves:
+            self._add(node, move)
+
+    def children(self, node):
+        first = self.first_child[node]
+        return range(first, first + self.child_count[node])
+
+    def move(self, node):
+        start = self.move_start[node]
+        squares = self.squares
+        return tuple(squares[i] for i in
+                     self.moves[start:start + self.move_length[node]])
+
+    def legal_move(self, node):
+        # The Move leading to `node`, for Board.make_legal_move()
+        start = self.move_start[node]
+        end = start + self.move_length[node]
+        squares = self.squares
+        return Move(
+            tuple(squares[i] for i in self.moves[start:end]),
+            [squares[i] for i in
+             self.moves[end:end + self.taken_length[node]]])
+
+    def nbytes(self):
+        arrays = [self.parent, self.first_child, self.child_count,
+                  self.visits, self.wins, self.move_start, self.move_length,
+                  self.taken_length, self.moves]
+        return sum(sys.getsizeof(a) for a in arrays)
+
+
+class MCTS:
+    # UCT: the tree grows by one expanded node per playout; playouts
+    # pick random legal moves until the game ends.
+    def __init__(self, exploration=EXPLORATION, seed=None, workers=1,
+                 max_nodes=1000000, evaluate=None,
+                 playout_plies=MAX_PLAYOUT_PLIES):
+        # `evaluate` decides playouts that reach `playout_plies`
+        if evaluate is None:
+            evaluate = engine.evaluate
+        self.exploration = exploration
+        self.evaluate = evaluate
+        self.playout_plies = playout_plies
+        self.rng = random.Random(seed)
+        self.workers = workers
+        self.max_nodes = max_nodes
+        self.tree = None
+
+    def search(self, board, depth=None, time_limit=None, node_limit=None,
+               callback=None, stop=None):
+        # `node_limit` is the number of playouts and `depth` limits how
+        # deep the tree grows. With workers > 1, each worker process
+        # searches its own tree (root parallelization) and the root
+        # statistics are added up; `stop` can't be used then.
+        start = time.perf_counter()
+        if depth is None:
+            depth = engine.MAX_DEPTH
+        if time_limit is None and node_limit is None and stop is None:
+            node_limit = DEFAULT_PLAYOUTS
+        if self.workers > 1:
+            if stop is not None:
+                raise ValueError('stop cannot be used with several workers')
+            stats, playouts, tree_nodes, tree_bytes = self._search_parallel(
+                board, depth, time_limit, node_limit)
+        else:
+            playouts = self._run(board.clone(), depth, time_limit,
+                                 node_limit, stop)
+            stats = self.root_stats()
+            tree_nodes = len(self.tree)
+            tree_bytes = self.tree.nbytes()
+        move = None
+        win_rate = 0
+        if stats:
+            move, visits, wins = max(stats, key=lambda s: (s[1], s[2]))
+            win_rate = wins / visits if visits else 0
+        result = MCTSResult(move, win_rate, playouts, tree_nodes, tree_bytes,
+                            time.perf_counter() - start)
+        if callback:
+            callback(result)
+        return result
+
+    def root_stats(self):
+        # [(move, visits, wins)] for the root's children
+        tree = self.tree
+        return [(tree.move(child), tree.visits[child], tree.wins[child])
+                for child in tree.children(0)]
+
+    def _run(self, board, depth, time_limit, node_limit, stop):
+        self.tree = Tree(board.size)
+        if time_limit is None:
+            deadline = None
+        else:
+            deadline = time.perf_counter() + time_limit
+        playouts = 0
+        while node_limit is None or playouts < node_limit:
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            if stop is not None and stop():
+                break
+            self._iterate(board, depth)
+            playouts += 1
+            if not self.tree.child_count[0]:
+                # No legal moves; nothing to search
+                break
+        return playouts
+
+    def _select(self, node):
+        tree = self.tree
+        visits = tree.visits
+        wins = tree.wins
+        scale = self.exploration * math.sqrt(math.log(visits[node]))
+        best = None
+        best_value = -1
+        for child in tree.children(node):
+            n = visits[child]
+            if not n:
+                return child
+            value = wins[child] / n + scale / math.sqrt(n)
+            if value > best_value:
+                best = child
+                best_value = value
+        return best
+
+    def _iterate(self, board, depth):
+        tree = self.tree
+        node = 0
+        nodes = [0]
+        records = []
+        try:
+            while tree.child_count[node]:
+                node = self._select(node)
+                records.append(board.make_legal_move(tree.legal_move(node)))
+                nodes.append(node)
+            if (tree.first_child[node] < 0 and len(records) < depth
+                    and len(tree) < self.max_nodes):
+                moves = board.legal_moves(grouped=True)
+                self.rng.shuffle(moves)
+                tree.expand(node, moves)
+                if moves:
+                    node = tree.first_child[node]
+                    records.append(board.make_legal_move(moves[0]))
+                    nodes.append(node)
+            winner = self._playout(board)
+        finally:
+            for record in reversed(records):
+                board.unmake_move(record)
+        # A node's wins count for the player who made the move into it
+        for node, record in zip(nodes, [None] + records):
+            tree.visits[node] += 1
+            if record is None:
+                continue
+            if winner == record.player:
+                tree.wins[node] += 1
+            elif winner is None:
+                tree.wins[node] += 0.5
+
+    def _playout(self, board):
+        # Returns the winner ('w', 'b' or None for a draw)
+        records = []
+        rng = self.rng
+        try:
+            while len(records) < self.playout_plies:
+                moves = board.legal_moves(grouped=True)
+                if not moves:
+                    return 'b' if board.player == 'w' else 'w'
+                records.append(board.make_legal_move(rng.choice(moves)))
+            score = self.evaluate(board)
+            if score > PLAYOUT_MARGIN:
+                return board.player
+            elif score < -PLAYOUT_MARGIN:
+                return 'b' if board.player == 'w' else 'w'
+            return None
+        finally:
+            for record in reversed(records):
+                board.unmake_move(record)
+
+    def _search_parallel(self, board, depth, time_limit, node_limit):
+        if node_limit is None:
+            limits = [None] * self.workers
+        else:
+            limits = [node_limit // self.workers
+                      + (i < node_limit % self.workers)
+                      for i in range(self.workers)]
+        seeds = [self.rng.getrandbits(64) for i in range(self.workers)]
+        options = dict(exploration=self.exploration, max_nodes=self.max_nodes,
+                       evaluate=self.evaluate,
+                       playout_plies=self.playout_plies)
+        with concurrent.futures.ProcessPoolExecutor(self.workers) as executor:
+            futures = [
+                executor.submit(_search_root, board.to_bytes(), seed, depth,
+                                time_limit, limit, options)
+                for seed, limit in zip(seeds, limits)]
+            results = [future.result() for future in futures]
+        totals = {}
+        for stats, playouts, tree_nodes, tree_bytes in results:
+            for move, visits, wins in stats:
+                total = totals.setdefault(move, [0, 0])
+                total[0] += visits
+                total[1] += wins
+        stats = [(move, visits, wins)
+                 for move, (visits, wins) in totals.items()]
+        return (stats, sum(r[1] for r in results), sum(r[2] for r in results),
+                sum(r[3] for r in results))
+
+
+def _search_root(data, seed, depth, time_limit, node_limit, options):
+    board = Board.from_bytes(data)
+    mcts = MCTS(seed=seed, **options)
+    result = mcts.search(board, depth, time_limit, node_limit)
+    return (mcts.root_stats(), result.playouts, result.tree_nodes,
+            result.tree_bytes)
+
+
+def print_result(result, file=None):
+    if result.move:
+        move = '-'.join(common.coord_name(*pos) for pos in result.move)
+    else:
+        move = '(none)'
+    print(f'{move} win rate {result.win_rate:.3f}'
+          + f' playouts {result.playouts} ({result.elapsed:.3f} s,'
+          + f' {result.nps:.0f} playouts/s)'
+          + f' tree {result.tree_nodes} nodes, {result.tree_bytes} bytes',
+          file=file)
+
+
+def add_arguments(parser):
+    parser.add_argument('--playouts', type=int, help='number of playouts')
+    parser.add_argument('--time', type=float, help='time limit in seconds')
+    parser.add_argument('--depth', type=int, default=engine.MAX_DEPTH,
+                        help='maximum tree depth')
+    parser.add_argument('--exploration', type=float, default=EXPLORATION)
+    parser.add_argument('--workers', type=int, default=1,
+                        help='processes for root-parallel search')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--size', type=int, default=8,
+                        help='board size for the starting position')
+    parser.add_argument('--file', help='diagram to start from (- for stdin)')
+    parser.set_defaults(func=main)
+
+
+def main(args):
+    board = common.board_from_args(args)
+    if args.playouts is None and args.time is None:
+        args.time = 5
+    MCTS(args.exploration, seed=args.seed, workers=args.workers).search(
+        board, depth=args.depth, time_limit=args.time,
+        node_limit=args.playouts, callback=print_result)
+    return 0
@@ -0,0 +1,112 @@
+import concurrent.futures
+import itertools
+import time
+
+from dama.board import Board
+from dama import common
+from dama import engine
+
+_worker_engine = None
+_worker_search = None
+
+
+def _init_worker():
+    global _worker_engine
+    _worker_engine = engine.Engine()
+
+
+def _search_child(data, depth, search_id):
+    # Entries left by an earlier (possibly deeper) search would make
+    # the scores differ from a fixed-depth single-process search, so
+    # the table and history only carry over within one search
+    global _worker_search
+    if search_id != _worker_search:
+        _worker_engine.table.clear()
+        _worker_engine.history.clear()
+        _worker_search = search_id
+    board = Board.from_bytes(data)
+    score = _worker_engine.score(board, depth, ply=1)
+    return score, _worker_engine.nodes
+
+
+class ParallelEngine:
+    def __init__(self, workers=None):
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker)
+        self._search_ids = itertools.count()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.executor.shutdown()
+
+    def search(self, board, depth):
+        # Root splitting: every root move is sent to a worker in the
+        # compact Board.to_bytes() encoding and searched to a fixed depth
+        # with a full window, so the score is exactly the one
+        # a single-process search gives.
+        start = time.perf_counter()
+        moves = board.legal_moves(grouped=True)
+        if not moves:
+            return engine.SearchResult(None, -engine.WIN, depth, 1,
+                                       time.perf_counter() - start)
+        search_id = next(self._search_ids)
+        futures = []
+        for move in moves:
+            record = board.make_move(move.path)
+            futures.append(self.executor.submit(
+                _search_child, board.to_bytes(), depth - 1, search_id))
+            board.unmake_move(record)
+        best_score = -engine.WIN - 1
+        best_move = None
+        nodes = 1
+        for move, future in zip(moves, futures):
+            child_score, child_nodes = future.result()
+            nodes += child_nodes
+            score = -child_score
+            if score > best_score:
+                best_score = score
+                best_move = move.path
+        return engine.SearchResult(best_move, best_score, depth, nodes,
+                                   time.perf_counter() - start)
+
+
+def scaling_benchmark(board, depth, worker_counts, file=None):
+    baseline = None
+    results = {}
+    for workers in worker_counts:
+        with ParallelEngine(workers) as parallel_engine:
+            result = parallel_engine.search(board, depth)
+        if baseline is None:
+            baseline = result.elapsed
+        results[workers] = result
+        print(f'{workers:3} workers: score {result.score}'
+              + f' nodes {result.nodes} ({result.elapsed:.3f} s,'
+              + f' {result.nps:.0f} nodes/s,'
+              + f' speedup {baseline / result.elapsed:.2f})', file=file)
+    return results
+
+
+def add_arguments(parser):
+    parser.add_argument('--depth', type=int, default=6)
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=[1, 2, 4, 8, 16])
+    parser.add_argument('--size', type=int, default=8,
+                        help='board size for the starting position')
+    parser.add_argument('--file', help='diagram to start from (- for stdin)')
+    parser.set_defaults(func=main)
+
+
+def main(args):
+    board = common.board_from_args(args)
+    results = scaling_benchmark(board, args.depth, args.workers)
+    single = engine.Engine().search(board, depth=args.depth)
+    engine.print_result(single)
+    if any(r.score != single.score for r in results.values()):
+        print('MISMATCH with single-process search')
+        return 1
+    return 0
@@ -0,0 +1,236 @@
+import collections
+import concurrent.futures
+import os
+import re
+import time
+
+from dama.board import Board
+from dama import common
+
+Game = collections.namedtuple('Game', ['tags', 'moves', 'result'])
+ReplayError = collections.namedtuple('ReplayError', ['ply', 'move', 'reason'])
+ReplayResult = collections.namedtuple('ReplayResult', ['board', 'error'])
+ValidationResult = collections.namedtuple(
+    'ValidationResult', ['games', 'moves', 'errors', 'elapsed'])
+
+RESULTS = {'1-0', '0-1', '1/2-1/2', '*'}
+# Points for white and black
+SCORES = {'1-0': (1, 0), '0-1': (0, 1), '1/2-1/2': (0.5, 0.5)}
+TAG_RE = re.compile(r'\[(\w+)\s+"((?:[^"\\]|\\.)*)"\]')
+COMMENT_RE = re.compile(r'\{[^}]*\}')
+MOVE_NUMBER_RE = re.compile(r'\d+\.+$')
+LINE_LENGTH = 79
+# Games on boards other than 8x8 have their size in this tag
+SIZE_TAG = 'Size'
+
+
+def read_games(lines):
+    # Streams games from an iterable of lines; a game ends at its
+    # result token, or at a blank line or new tags after its moves
+    tags = {}
+    moves = []
+    pending = ''
+    for line in lines:
+        stripped = (pending + line).strip()
+        pending = ''
+        if stripped.startswith('['):
+            if moves:
+                yield Game(tags, moves, '*')
+                tags = {}
+                moves = []
+            for name, value in TAG_RE.findall(stripped):
+                tags[name] = value.replace('\\"', '"').replace('\\\\', '\\')
+            continue
+        if not stripped:
+            if moves:
+                yield Game(tags, moves, '*')
+                tags = {}
+                moves = []
+            continue
+        text = COMMENT_RE.sub(' ', stripped)
+        if '{' in text:
+            text, pending = text.split('{', 1)
+            pending = '{' + pending + ' '
+        for token in text.split():
+            if token in RESULTS:
+                yield Game(tags, moves, token)
+                tags = {}
+                moves = []
+            elif not MOVE_NUMBER_RE.match(token):
+                moves.append(token)
+    if tags or moves:
+        yield Game(tags, moves, '*')
+
+
+def parse_move(text):
+    if 'x' in text:
+        names = text.split('x')
+    else:
+        names = text.split('-')
+    if len(names) < 2:
+        raise ValueError(f'bad move: {text}')
+    try:
+        return [common.coord_from_name(name) for name in names]
+    except (ValueError, IndexError):
+        raise ValueError(f'bad move: {text}')
+
+
+def format_move(record):
+    separator = 'x' if record.captured else '-'
+    return separator.join(common.coord_name(*pos) for pos in record.path)
+
+
+def game_size(game):
+    size = int(game.tags.get(SIZE_TAG, 8))
+    if not 2 <= size <= common.MAX_SIZE:
+        raise ValueError(f'bad board size: {size}')
+    return size
+
+
+def replay(game, board=None):
+    if board is None:
+        try:
+            board = Board(size=game_size(game))
+        except ValueError:
+            return ReplayResult(None, ReplayError(
+                0, game.tags[SIZE_TAG], 'bad board size'))
+    for ply, text in enumerate(game.moves):
+        try:
+            path = parse_move(text)
+        except ValueError as e:
+            return ReplayResult(board, ReplayError(ply, text, str(e)))
+        try:
+            record = board.make_move(path)
+        except ValueError:
+            return ReplayResult(board, ReplayError(ply, text, 'illegal move'))
+        if bool(record.captured) != ('x' in text):
+            board.unmake_move(record)
+            return ReplayResult(board, ReplayError(
+                ply, text, 'wrong capture marker'))
+    return ReplayResult(board, None)
+
+
+def _quote(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def write_game(file, records, result='*', tags=None, size=8):
+    tags = dict(tags or {})
+    tags.setdefault('Event', '?')
+    if size != 8:
+        tags[SIZE_TAG] = str(size)
+    tags['Result'] = result
+    for name, value in tags.items():
+        file.write(f'[{name} "{_quote(value)}"]\n')
+    file.write('\n')
+    tokens = []
+    for ply, record in enumerate(records):
+        if ply % 2 == 0:
+            tokens.append(f'{ply // 2 + 1}.')
+        tokens.append(format_move(record))
+    tokens.append(result)
+    line = ''
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > LINE_LENGTH:
+            file.write(line + '\n')
+            line = token
+        elif line:
+            line += ' ' + token
+        else:
+            line = token
+    file.write(line + '\n\n')
+
+
+def _is_game_start(line, previous):
+    return line.startswith(b'[') and not previous.lstrip().startswith(b'[')
+
+
+def chunk_offsets(path, count):
+    # Split a file into `count` byte ranges that start at game boundaries
+    size = os.path.getsize(path)
+    offsets = [0]
+    with open(path, 'rb') as f:
+        for i in range(1, count):
+            f.seek(max(size * i // count, offsets[-1]))
+            f.readline()
+            previous = b'['
+            while True:
+                position = f.tell()
+                line = f.readline()
+                if not line:
+                    position = size
+                    break
+                if _is_game_start(line, previous):
+                    break
+                previous = line
+            offsets.append(position)
+    offsets.append(size)
+    return offsets
+
+
+def _read_lines(path, start, end):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        position = start
+        while position < end:
+            line = f.readline()
+            if not line:
+                break
+            position += len(line)
+            yield line.decode('utf-8')
+
+
+def _validate_chunk(path, start, end):
+    games = 0
+    moves = 0
+    errors = []
+    for game in read_games(_read_lines(path, start, end)):
+        result = replay(game)
+        if result.error:
+            errors.append((games, game.tags, result.error))
+            moves += result.error.ply
+        else:
+            moves += len(game.moves)
+        games += 1
+    return games, moves, errors
+
+
+def validate_file(path, workers=1):
+    start_time = time.perf_counter()
+    if workers > 1:
+        offsets = chunk_offsets(path, workers * 4)
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            chunks = list(executor.map(
+                _validate_chunk, [path] * (len(offsets) - 1),
+                offsets[:-1], offsets[1:]))
+    else:
+        chunks = [_validate_chunk(path, 0, os.path.getsize(path))]
+    games = 0
+    moves = 0
+    errors = []
+    for chunk_games, chunk_moves, chunk_errors in chunks:
+        for index, tags, error in chunk_errors:
+            errors.append((games + index, tags, error))
+        games += chunk_games
+        moves += chunk_moves
+    return ValidationResult(games, moves, errors,
+                            time.perf_counter() - start_time)
+
+
+def add_arguments(parser):
+    parser.add_argument('path', help='PDN file to validate')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.set_defaults(func=main)
+
+
+def main(args):
+    result = validate_file(args.path, workers=args.workers)
+    for index, tags, error in result.errors:
+        event = tags.get('Event', '?')
+        print(f'game {index + 1} ({event}): move {error.ply + 1}'
+              + f' {error.move}: {error.reason}')
+    rate = result.games / result.elapsed if result.elapsed else 0
+    print(f'{result.games} games, {result.moves} moves,'
+          + f' {len(result.errors)} invalid,'
+          + f' {result.elapsed:.3f} s, {rate:.0f} games/s')
+    return 1 if result.errors else 0
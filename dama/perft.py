@@ -0,0 +1,167 @@
+import collections
+import time
+
+from dama.board import Board
+from dama.bitboard import BitBoard
+from dama.compact import CompactBoard
+from dama import common
+
+PerftResult = collections.namedtuple(
+    'PerftResult', ['nodes', 'captures', 'promotions'])
+
+BACKENDS = {'dict': Board, 'bit': BitBoard, 'compact': CompactBoard}
+
+# Reference numbers: for each position, {depth: (nodes, captures, promotions)}
+REFERENCE = {
+    'start8': (8, None, {
+        1: (7, 0, 0),
+        2: (49, 0, 0),
+        3: (302, 11, 0),
+        4: (1469, 169, 0),
+        5: (7361, 880, 0),
+        6: (36768, 4290, 0),
+    }),
+    'start10': (10, None, {
+        1: (9, 0, 0),
+        2: (81, 0, 0),
+        3: (810, 0, 0),
+        4: (8100, 0, 0),
+        5: (88900, 110, 0),
+    }),
+    'king-chain': (8, """[w]
+        | . . . .|
+        |. b . . |
+        | . . b .|
+        |. . . . |
+        | b w . b|
+        |. . b . |
+        | b . . .|
+        |W . . . |
+    """, {
+        1: (2, 2, 0),
+        2: (2, 0, 0),
+        3: (20, 0, 0),
+        4: (40, 0, 0),
+        5: (367, 4, 0),
+        6: (524, 0, 524),
+    }),
+    'king-return': (8, """[w]
+        | . . . .|
+        |. b b . |
+        | W . . .|
+        |. b b . |
+        | . . . .|
+        |. . b . |
+        | . . . .|
+        |. . . . |
+    """, {
+        1: (16, 16, 0),
+        2: (62, 0, 0),
+        3: (379, 54, 0),
+        4: (1286, 54, 208),
+        5: (7772, 1434, 0),
+        6: (34062, 1179, 4541),
+    }),
+    'kings': (8, """[w]
+        | . . . .|
+        |. . . b |
+        | . . . .|
+        |. . W . |
+        | . . . .|
+        |. b . b |
+        | . . w .|
+        |. . . . |
+    """, {
+        1: (4, 4, 0),
+        2: (7, 3, 3),
+        3: (40, 4, 0),
+        4: (160, 1, 36),
+        5: (1153, 51, 0),
+        6: (5287, 347, 1016),
+    }),
+}
+
+
+def perft(board, depth):
+    if depth == 0:
+        return PerftResult(1, 0, 0)
+    nodes = captures = promotions = 0
+    last_row = board.size - 1 if board.player == 'w' else 0
+    pieces = board.pieces
+    for move in board.legal_moves():
+        if depth == 1:
+            nodes += 1
+            if move.taken:
+                captures += 1
+            end = move.path[-1]
+            if end[1] == last_row and pieces[move.path[0]].islower():
+                promotions += 1
+        else:
+            record = board.make_move(move.path)
+            result = perft(board, depth - 1)
+            board.unmake_move(record)
+            nodes += result.nodes
+            captures += result.captures
+            promotions += result.promotions
+    return PerftResult(nodes, captures, promotions)
+
+
+def reference_board(name, board_class=Board):
+    size, diagram, expected = REFERENCE[name]
+    if diagram is None:
+        return board_class(size=size)
+    else:
+        return board_class.load(diagram)
+
+
+def run_perft(board, depth, out=None):
+    total_nodes = 0
+    total_time = 0
+    for d in range(1, depth + 1):
+        start = time.perf_counter()
+        result = perft(board, d)
+        elapsed = time.perf_counter() - start
+        total_nodes += result.nodes
+        total_time += elapsed
+        print(f'depth {d}: nodes {result.nodes}'
+              + f' captures {result.captures}'
+              + f' promotions {result.promotions}'
+              + f' ({elapsed:.3f} s, {_rate(result.nodes, elapsed)} nodes/s)',
+              file=out)
+        yield d, result
+    print(f'total: {total_nodes} nodes in {total_time:.3f} s,'
+          + f' {_rate(total_nodes, total_time)} nodes/s', file=out)
+
+
+def _rate(count, elapsed):
+    if not elapsed:
+        return 'inf'
+    return f'{count / elapsed:.0f}'
+
+
+def add_arguments(parser):
+    parser.add_argument('depth', type=int, nargs='?', default=4)
+    parser.add_argument('--size', type=int, default=8,
+                        help='board size for the starting position')
+    parser.add_argument('--file', help='diagram to start from (- for stdin)')
+    parser.add_argument('--backend', choices=BACKENDS, default='dict')
+    parser.add_argument('--reference', action='store_true',
+                        help='check and time all reference positions')
+    parser.set_defaults(func=main)
+
+
+def main(args):
+    board_class = BACKENDS[args.backend]
+    if args.reference:
+        failed = False
+        for name, (size, diagram, expected) in REFERENCE.items():
+            print(f'{name}:')
+            board = reference_board(name, board_class)
+            for d, result in run_perft(board, max(expected)):
+                if result != expected[d]:
+                    print(f'  MISMATCH at depth {d}: expected {expected[d]}')
+                    failed = True
+        return 1 if failed else 0
+    board = common.board_from_args(args, board_class)
+    list(run_perft(board, args.depth))
+    return 0
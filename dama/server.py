@@ -0,0 +1,236 @@
+import asyncio
+import collections
+import concurrent.futures
+import inspect
+import itertools
+import os
+import time
+
+from dama.board import Board, MoveCache
+from dama import common
+from dama import engine
+
+# Line protocol: one command per line, one reply line per command.
+#
+#   new [SIZE]             -> ok ID
+#   moves ID [SQUARE...]   -> ok SQUARE...   (possible next squares)
+#   move ID SQUARE...      -> ok
+#   play ID [SECONDS]      -> ok SQUARE-SQUARE...   (the engine moves)
+#   board ID               -> ok HEX   (Board.to_bytes() of the position)
+#   close ID               -> ok
+#   stats                  -> ok COMMAND n=N p50=MS p90=MS p99=MS; ...
+#   quit
+#
+# Errors are reported as "error MESSAGE".
+
+MAX_THINK_TIME = 10
+LATENCY_SAMPLES = 10000
+
+_worker_engine = None
+
+
+class CommandError(Exception):
+    pass
+
+
+def _init_worker():
+    global _worker_engine
+    _worker_engine = engine.Engine()
+
+
+def _engine_move(data, time_limit):
+    board = Board.from_bytes(data)
+    return _worker_engine.search(board, time_limit=time_limit).move
+
+
+def _percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+class Server:
+    # Sessions are kept in LRU order; beyond max_sessions the least
+    # recently used one is dropped. All boards share one move cache,
+    # so memory stays bounded however many sessions are open.
+    def __init__(self, executor=None, max_sessions=100000,
+                 move_cache=None):
+        if executor is None:
+            executor = concurrent.futures.ProcessPoolExecutor(
+                initializer=_init_worker)
+        self.executor = executor
+        self.max_sessions = max_sessions
+        self.move_cache = move_cache or MoveCache(100000)
+        self.sessions = collections.OrderedDict()
+        self.busy = set()
+        self.latencies = collections.defaultdict(
+            lambda: collections.deque(maxlen=LATENCY_SAMPLES))
+        self._ids = itertools.count(1)
+        self._commands = {
+            'new': self.new,
+            'moves': self.moves,
+            'move': self.move,
+            'play': self.play,
+            'board': self.board,
+            'close': self.close_session,
+            'stats': self.stats,
+        }
+
+    def close(self):
+        self.executor.shutdown()
+
+    def get_session(self, game_id):
+        try:
+            board = self.sessions[game_id]
+        except KeyError:
+            raise CommandError(f'no such game: {game_id}')
+        self.sessions.move_to_end(game_id)
+        return board
+
+    def get_idle_session(self, game_id):
+        board = self.get_session(game_id)
+        if game_id in self.busy:
+            raise CommandError('engine is thinking')
+        return board
+
+    def new(self, size='8'):
+        if not size.isdigit() or not 2 <= int(size) <= common.MAX_SIZE:
+            raise CommandError(f'bad size: {size}')
+        board = Board(size=int(size), move_cache=self.move_cache)
+        game_id = str(next(self._ids))
+        self.sessions[game_id] = board
+        while len(self.sessions) > self.max_sessions:
+            self.sessions.popitem(last=False)
+        return game_id
+
+    def _parse_squares(self, names):
+        try:
+            return [common.coord_from_name(name) for name in names]
+        except (ValueError, IndexError):
+            raise CommandError('bad square')
+
+    def moves(self, game_id, *prefix):
+        board = self.get_idle_session(game_id)
+        try:
+            squares = board.possible_moves(self._parse_squares(prefix))
+        except ValueError:
+            raise CommandError('bad prefix')
+        return ' '.join(sorted(common.coord_name(*pos) for pos in squares))
+
+    def move(self, game_id, *path):
+        board = self.get_idle_session(game_id)
+        try:
+            board.make_move(self._parse_squares(path))
+        except ValueError:
+            raise CommandError('illegal move')
+        return ''
+
+    async def play(self, game_id, time_limit='1'):
+        board = self.get_idle_session(game_id)
+        try:
+            seconds = min(float(time_limit), MAX_THINK_TIME)
+        except ValueError:
+            seconds = None
+        if not seconds or not seconds > 0:
+            raise CommandError(f'bad time: {time_limit}')
+        if not board.legal_moves():
+            raise CommandError('game over')
+        self.busy.add(game_id)
+        try:
+            loop = asyncio.get_running_loop()
+            path = await loop.run_in_executor(
+                self.executor, _engine_move, board.to_bytes(), seconds)
+        finally:
+            self.busy.discard(game_id)
+        board.make_move(path)
+        return '-'.join(common.coord_name(*pos) for pos in path)
+
+    def board(self, game_id):
+        return self.get_session(game_id).to_bytes().hex()
+
+    def close_session(self, game_id):
+        self.get_idle_session(game_id)
+        del self.sessions[game_id]
+        return ''
+
+    def stats(self):
+        parts = []
+        for name, samples in sorted(self.latencies.items()):
+            values = sorted(samples)
+            parts.append(
+                f'{name} n={len(values)}'
+                + ''.join(f' p{p}={_percentile(values, p / 100) * 1000:.3f}'
+                          for p in (50, 90, 99)))
+        return '; '.join(parts)
+
+    async def execute(self, line):
+        start = time.perf_counter()
+        words = line.split()
+        if not words:
+            return 'error empty command'
+        name, *arguments = words
+        try:
+            command = self._commands[name]
+        except KeyError:
+            return f'error unknown command: {name}'
+        try:
+            inspect.signature(command).bind(*arguments)
+        except TypeError:
+            return f'error bad arguments for {name}'
+        try:
+            result = command(*arguments)
+            if asyncio.iscoroutine(result):
+                result = await result
+        except CommandError as e:
+            reply = f'error {e}'
+        else:
+            reply = f'ok {result}' if result else 'ok'
+        self.latencies[name].append(time.perf_counter() - start)
+        return reply
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                line = line.decode('utf-8', 'replace').strip()
+                if line == 'quit':
+                    break
+                writer.write((await self.execute(line) + '\n').encode())
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            # ValueError: line too long
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host='localhost', port=0):
+        return await asyncio.start_server(self.handle, host, port)
+
+
+async def serve(host, port, workers):
+    server = Server(concurrent.futures.ProcessPoolExecutor(
+        workers, initializer=_init_worker))
+    try:
+        tcp_server = await server.start(host, port)
+        for sock in tcp_server.sockets:
+            print('listening on {}:{}'.format(*sock.getsockname()[:2]))
+        async with tcp_server:
+            await tcp_server.serve_forever()
+    finally:
+        server.close()
+
+
+def add_arguments(parser):
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=5050)
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='processes for engine moves')
+    parser.set_defaults(func=main)
+
+
+def main(args):
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers))
+    except KeyboardInterrupt:
+        pass
+    return 0
@@ -0,0 +1,225 @@
+import array
+import collections
+import math
+import mmap
+import struct
+import time
+
+from dama.board import Board, get_geometry
+from dama import common
+
+# File layout: header, then one byte per position in index order.
+# The byte is 0 for a draw, otherwise 1 + the number of plies until the
+# side that cannot move loses: odd distances are wins for the side to
+# move, even distances are losses.
+MAGIC = b'DAMATB1\0'
+HEADER = struct.Struct('<8sBB')
+
+PIECE_CODES = {'w': 0, 'b': 1, 'W': 2, 'B': 3}
+PIECE_SYMBOLS = 'wbWB'
+
+ProbeResult = collections.namedtuple('ProbeResult', ['result', 'distance'])
+
+
+class Indexer:
+    def __init__(self, size, max_pieces):
+        self.size = size
+        self.max_pieces = max_pieces
+        geometry = get_geometry(size)
+        self.squares = geometry.squares
+        self.square_numbers = geometry.index
+        self.offsets = [0, 0]
+        for k in range(1, max_pieces + 1):
+            count = math.comb(len(self.squares), k) * 4 ** k * 2
+            self.offsets.append(self.offsets[-1] + count)
+        self.count = self.offsets[-1]
+
+    def index(self, pieces, player):
+        k = len(pieces)
+        rank = 0
+        types = 0
+        items = sorted((self.square_numbers[pos], c)
+                       for pos, c in pieces.items())
+        for i, (square, c) in enumerate(items):
+            rank += math.comb(square, i + 1)
+            types = types * 4 + PIECE_CODES[c]
+        index = self.offsets[k] + ((rank << 2 * k) + types) * 2
+        return index + (player == 'b')
+
+    def position(self, index):
+        k = 1
+        while index >= self.offsets[k + 1]:
+            k += 1
+        index -= self.offsets[k]
+        player = 'wb'[index % 2]
+        index //= 2
+        types = index & ((1 << 2 * k) - 1)
+        rank = index >> 2 * k
+        squares = []
+        for i in range(k, 0, -1):
+            square = i - 1
+            while math.comb(square + 1, i) <= rank:
+                square += 1
+            rank -= math.comb(square, i)
+            squares.append(square)
+        pieces = {}
+        for square in squares:
+            pieces[self.squares[square]] = PIECE_SYMBOLS[types & 3]
+            types >>= 2
+        return pieces, player
+
+
+def _child_index(indexer, board, move):
+    pieces = dict(board.pieces)
+    piece = pieces.pop(move.path[0])
+    for pos in move.taken:
+        del pieces[pos]
+    end = move.path[-1]
+    if board.player == 'w':
+        if end[1] == board.size - 1:
+            piece = piece.upper()
+    elif end[1] == 0:
+        piece = piece.upper()
+    pieces[end] = piece
+    return indexer.index(pieces, 'b' if board.player == 'w' else 'w')
+
+
+def generate(size, max_pieces):
+    indexer = Indexer(size, max_pieces)
+    count = indexer.count
+
+    # Forward pass: successors of every position, as flat arrays
+    offsets = array.array('Q', [0])
+    edges = array.array('Q')
+    for i in range(count):
+        pieces, player = indexer.position(i)
+        board = Board(size=size, pieces=pieces, player=player)
+        for move in board.legal_moves():
+            edges.append(_child_index(indexer, board, move))
+        offsets.append(len(edges))
+
+    # Reverse the graph
+    pred_offsets = array.array('Q', bytes(8 * (count + 1)))
+    for child in edges:
+        pred_offsets[child + 1] += 1
+    for i in range(count):
+        pred_offsets[i + 1] += pred_offsets[i]
+    fill = array.array('Q', pred_offsets)
+    preds = array.array('Q', bytes(8 * len(edges)))
+    for parent in range(count):
+        for j in range(offsets[parent], offsets[parent + 1]):
+            child = edges[j]
+            preds[fill[child]] = parent
+            fill[child] += 1
+
+    # Retrograde pass, in order of increasing distance
+    table = bytearray(count)
+    remaining = array.array('Q', (offsets[i + 1] - offsets[i]
+                                  for i in range(count)))
+    queue = collections.deque()
+    for i in range(count):
+        if not remaining[i]:
+            table[i] = 1
+            queue.append(i)
+    while queue:
+        position = queue.popleft()
+        value = table[position] + 1
+        if value > 255:
+            raise ValueError('distance too long for the table format')
+        for j in range(pred_offsets[position], pred_offsets[position + 1]):
+            parent = preds[j]
+            if table[parent]:
+                continue
+            if value % 2 == 0:
+                table[parent] = value
+                queue.append(parent)
+            else:
+                remaining[parent] -= 1
+                if not remaining[parent]:
+                    table[parent] = value
+                    queue.append(parent)
+    return table
+
+
+def write(path, size, max_pieces, table):
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, size, max_pieces))
+        f.write(table)
+
+
+class Tablebase:
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, size, max_pieces = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            raise ValueError('not a tablebase file')
+        self.size = size
+        self.max_pieces = max_pieces
+        self.indexer = Indexer(size, max_pieces)
+        if len(self._mmap) != HEADER.size + self.indexer.count:
+            raise ValueError('bad tablebase size')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._mmap.close()
+
+    def probe(self, board):
+        pieces = board.pieces
+        if (board.size != self.size or not pieces
+                or len(pieces) > self.max_pieces):
+            return None
+        index = self.indexer.index(pieces, board.player)
+        value = self._mmap[HEADER.size + index]
+        if not value:
+            return ProbeResult('draw', None)
+        distance = value - 1
+        if distance % 2:
+            return ProbeResult('win', distance)
+        else:
+            return ProbeResult('loss', distance)
+
+
+def add_arguments(parser):
+    subparsers = parser.add_subparsers(dest='tablebase_command',
+                                       required=True)
+    build = subparsers.add_parser('build', help='generate a tablebase file')
+    build.add_argument('path')
+    build.add_argument('--size', type=int, default=8)
+    build.add_argument('--pieces', type=int, default=2)
+    build.set_defaults(func=build_main)
+    probe = subparsers.add_parser('probe', help='look up a position')
+    probe.add_argument('path')
+    probe.add_argument('--file', help='diagram to look up (- for stdin)')
+    probe.set_defaults(func=probe_main, size=8)
+
+
+def build_main(args):
+    start = time.perf_counter()
+    table = generate(args.size, args.pieces)
+    write(args.path, args.size, args.pieces, table)
+    counts = collections.Counter(
+        'draw' if not v else 'win' if v % 2 == 0 else 'loss' for v in table)
+    print(f'{len(table)} positions ({counts["win"]} wins,'
+          + f' {counts["loss"]} losses, {counts["draw"]} draws)'
+          + f' in {time.perf_counter() - start:.3f} s')
+    return 0
+
+
+def probe_main(args):
+    with Tablebase(args.path) as tablebase:
+        args.size = tablebase.size
+        result = tablebase.probe(common.board_from_args(args))
+    if result is None:
+        print('position not in tablebase')
+        return 1
+    elif result.distance is None:
+        print(result.result)
+    else:
+        print(f'{result.result} in {result.distance} plies')
+    return 0
@@ -0,0 +1,124 @@
+import concurrent.futures
+import multiprocessing
+import time
+
+from dama.board import Board
+from dama import book
+from dama import engine
+
+_worker_engine = None
+_stopped = None
+
+
+def _init_worker(stopped, book_path=None):
+    global _worker_engine, _stopped
+    if book_path is None:
+        opening_book = None
+    else:
+        opening_book = book.Book(book_path)
+    _worker_engine = engine.Engine(book=opening_book)
+    _stopped = stopped
+
+
+def _think(data, task, time_limit):
+    # Searches until the time limit, or until the task is stopped.
+    # Also returns the reply the engine expects, to ponder on it.
+    board = Board.from_bytes(data)
+    result = _worker_engine.search(
+        board, time_limit=time_limit,
+        stop=lambda: _stopped.value >= task)
+    reply = None
+    if result.move:
+        board.make_move(result.move)
+        entry = _worker_engine.table.get(board.hash)
+        if entry is not None:
+            reply = entry.move
+    return result, reply
+
+
+class BackgroundEngine:
+    # Runs the engine in a separate process, so the caller (the GUI event
+    # loop) never blocks. After the engine moves, ponder() searches the
+    # position after the expected reply while the opponent thinks; if the
+    # opponent plays that reply, think() keeps the pondering search going
+    # instead of starting a new one.
+    def __init__(self, think_time=2, book_path=None):
+        self.think_time = think_time
+        self.ponder_hits = 0
+        self.ponder_misses = 0
+        self._stopped = multiprocessing.Value('q', 0)
+        self._executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=1, initializer=_init_worker,
+            initargs=(self._stopped, book_path))
+        self._task = 0
+        self._future = None
+        self._pondering = None
+        self._ponder_start = None
+        self._deadline = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._stop()
+        self._executor.shutdown()
+
+    @property
+    def busy(self):
+        return self._future is not None
+
+    @property
+    def pondering(self):
+        return self._pondering is not None
+
+    def _submit(self, board, time_limit):
+        self._task += 1
+        self._future = self._executor.submit(
+            _think, board.to_bytes(), self._task, time_limit)
+
+    def _stop(self):
+        self._stopped.value = self._task
+
+    def think(self, board):
+        now = time.perf_counter()
+        if self._pondering is not None and self._pondering == board.hash:
+            self.ponder_hits += 1
+            elapsed = now - self._ponder_start
+            self._deadline = now + max(0, self.think_time - elapsed)
+        else:
+            if self._pondering is not None:
+                self.ponder_misses += 1
+            self._stop()
+            self._submit(board, self.think_time)
+            self._deadline = None
+        self._pondering = None
+
+    def ponder(self, board, reply):
+        if reply not in {move.path for move in board.legal_moves()}:
+            return
+        record = board.make_move(reply)
+        try:
+            self._pondering = board.hash
+            self._submit(board, None)
+        finally:
+            board.unmake_move(record)
+        self._ponder_start = time.perf_counter()
+        self._deadline = None
+
+    def poll(self):
+        # Returns (search result, expected reply) once the engine's move
+        # is ready, None while it is still thinking or pondering
+        if self._future is None or self._pondering is not None:
+            return None
+        if (self._deadline is not None
+                and time.perf_counter() >= self._deadline):
+            self._stop()
+            self._deadline = None
+        if not self._future.done():
+            return None
+        future = self._future
+        self._future = None
+        return future.result()
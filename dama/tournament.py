@@ -0,0 +1,270 @@
+import collections
+import concurrent.futures
+import functools
+import math
+import os
+import random
+import time
+
+from dama.board import Board, openings
+from dama import engine
+from dama import mcts
+from dama import pdn
+
+Player = collections.namedtuple(
+    'Player', ['name', 'nodes', 'depth', 'man', 'king', 'advance', 'center',
+               'back_rank', 'search'])
+GameResult = collections.namedtuple(
+    'GameResult',
+    ['round', 'opening', 'white', 'black', 'result', 'records', 'nodes',
+     'elapsed'])
+Standing = collections.namedtuple(
+    'Standing', ['games', 'wins', 'draws', 'losses', 'score', 'elo',
+                 'elo_error'])
+
+# None means the engine's default
+DEFAULT_PLAYER = Player('engine', 2000, None, None, None, None, None, None,
+                        'alphabeta')
+PLAYER_FIELDS = {'name': str, 'nodes': int, 'depth': int, 'man': int,
+                 'king': int, 'advance': int, 'center': int, 'back_rank': int,
+                 'search': str}
+# For MCTS players, `nodes` is the number of playouts per move
+SEARCHES = ('alphabeta', 'mcts')
+# Player fields that are passed to engine.evaluate as they are
+EVALUATE_OPTIONS = {'advance': 'advance_value', 'center': 'center_value',
+                    'back_rank': 'back_rank_value'}
+
+
+def parse_player(text, name):
+    # 'nodes=5000,king=250' -> Player; unset fields keep their defaults
+    player = DEFAULT_PLAYER._replace(name=name)
+    for item in filter(None, text.split(',')):
+        key, sep, value = item.partition('=')
+        if not sep or key not in PLAYER_FIELDS:
+            raise ValueError(f'bad player option: {item}')
+        player = player._replace(**{key: PLAYER_FIELDS[key](value)})
+    if player.search not in SEARCHES:
+        raise ValueError(f'bad search: {player.search}')
+    return player
+
+
+def make_engine(player):
+    piece_values = dict(engine.PIECE_VALUES)
+    if player.man is not None:
+        piece_values.update(w=player.man, b=player.man)
+    if player.king is not None:
+        piece_values.update(W=player.king, B=player.king)
+    options = {option: getattr(player, field)
+               for field, option in EVALUATE_OPTIONS.items()
+               if getattr(player, field) is not None}
+    evaluate = functools.partial(
+        engine.evaluate, piece_values=piece_values, **options)
+    if player.search == 'mcts':
+        return mcts.MCTS(seed=0, evaluate=evaluate)
+    return engine.Engine(evaluate=evaluate)
+
+
+def play_game(round, opening, moves, white, black, size, max_plies):
+    start = time.perf_counter()
+    board = Board(size=size)
+    engines = {'w': make_engine(white), 'b': make_engine(black)}
+    players = {'w': white, 'b': black}
+    records = [board.make_move(path) for path in moves]
+    seen = collections.Counter([board.hash])
+    nodes = 0
+    result = '1/2-1/2'
+    while len(records) < max_plies:
+        if not board.legal_moves():
+            result = '0-1' if board.player == 'w' else '1-0'
+            break
+        player = players[board.player]
+        search = engines[board.player].search(
+            board, depth=player.depth or engine.MAX_DEPTH,
+            node_limit=player.nodes)
+        nodes += search.nodes
+        records.append(board.make_move(search.move))
+        seen[board.hash] += 1
+        if seen[board.hash] >= 3:
+            break
+    return GameResult(round, opening, white.name, black.name, result,
+                      records, nodes, time.perf_counter() - start)
+
+
+def random_line(size, moves, plies, rng):
+    # `moves` followed by up to `plies` random legal moves
+    board = Board(size=size)
+    for path in moves:
+        board.make_move(path)
+    moves = list(moves)
+    for i in range(plies):
+        legal = board.legal_moves()
+        if not legal:
+            break
+        move = rng.choice(legal)
+        board.make_legal_move(move)
+        moves.append(move.path)
+    return moves
+
+
+def limit_games(games, distinct, random_plies, file=None):
+    # The engines are deterministic, so without random plies only
+    # `distinct` different games can be played
+    if random_plies or games <= distinct:
+        return games
+    print(f'warning: only {distinct} distinct games without'
+          + f' --random-plies; playing {distinct} instead of {games}',
+          file=file)
+    return distinct
+
+
+def selfplay(builder, games, player=None, opening_plies=2, max_plies=200,
+             workers=None, random_plies=0, seed=0, file=None):
+    # Engine-versus-engine games from every opening in turn, added to
+    # a book.BookBuilder
+    if player is None:
+        player = DEFAULT_PLAYER
+    lines = openings(builder.size, opening_plies)
+    games = limit_games(games, len(lines), random_plies, file)
+    rng = random.Random(seed)
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        futures = [
+            executor.submit(play_game, i, i % len(lines),
+                            random_line(builder.size, lines[i % len(lines)],
+                                        random_plies, rng),
+                            player, player, builder.size, max_plies)
+            for i in range(games)]
+        for future in concurrent.futures.as_completed(futures):
+            game = future.result()
+            builder.add_game([r.path for r in game.records], game.result)
+
+
+def elo(score):
+    if score <= 0:
+        return -math.inf
+    elif score >= 1:
+        return math.inf
+    return 400 * math.log10(score / (1 - score))
+
+
+def standing(scores):
+    # Elo difference from the first player's point of view, with
+    # a 95% confidence interval from the spread of the game scores
+    games = len(scores)
+    wins = scores.count(1)
+    draws = scores.count(0.5)
+    losses = scores.count(0)
+    if not games:
+        return Standing(0, 0, 0, 0, 0, 0, math.inf)
+    mean = sum(scores) / games
+    variance = sum((s - mean) ** 2 for s in scores) / games
+    margin = 1.96 * math.sqrt(variance / games)
+    error = (elo(min(mean + margin, 1)) - elo(max(mean - margin, 0))) / 2
+    return Standing(games, wins, draws, losses, mean, elo(mean), error)
+
+
+def format_standing(s, a, b):
+    return (f'{a} vs {b}: +{s.wins} ={s.draws} -{s.losses}'
+            + f' ({s.score * 100:.1f}%),'
+            + f' Elo {s.elo:+.1f} ± {s.elo_error:.1f}')
+
+
+def run_tournament(a, b, size=8, opening_plies=2, games=None, workers=None,
+                   max_plies=200, output=None, report=None, file=None,
+                   random_plies=0, seed=0):
+    opening_list = openings(size, opening_plies)
+    if games is None:
+        games = len(opening_list) * 2
+    games = limit_games(games, len(opening_list) * 2, random_plies, file)
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    scores = []
+    nodes = 0
+    search_time = 0
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        futures = []
+        for round in range(games):
+            # Both players get each line once with either color
+            if round % 2 == 0:
+                opening = round // 2 % len(opening_list)
+                moves = random_line(size, opening_list[opening],
+                                    random_plies, rng)
+            white, black = (a, b) if round % 2 == 0 else (b, a)
+            futures.append(executor.submit(
+                play_game, round, opening, moves,
+                white, black, size, max_plies))
+        for future in concurrent.futures.as_completed(futures):
+            game = future.result()
+            score_a = pdn.SCORES[game.result][game.white != a.name]
+            scores.append(score_a)
+            nodes += game.nodes
+            search_time += game.elapsed
+            if output is not None:
+                pdn.write_game(output, game.records, game.result, {
+                    'Event': f'{a.name} vs {b.name}',
+                    'Round': str(game.round + 1),
+                    'White': game.white,
+                    'Black': game.black,
+                    'Opening': str(game.opening + 1),
+                }, size=size)
+                output.flush()
+            if report and len(scores) % report == 0:
+                print(format_standing(standing(scores), a.name, b.name),
+                      file=file)
+    elapsed = time.perf_counter() - start
+    result = standing(scores)
+    print(format_standing(result, a.name, b.name), file=file)
+    draw_rate = result.draws / result.games if result.games else 0
+    print(f'{result.games} games in {elapsed:.1f} s'
+          + f' ({result.games / elapsed:.2f} games/s),'
+          + f' {nodes / search_time if search_time else 0:.0f} nodes/s'
+          + f' per worker, draw rate {draw_rate * 100:.1f}%', file=file)
+    return result
+
+
+def add_arguments(parser):
+    parser.add_argument('-a', '--player-a', default='',
+                        help='first engine, e.g. nodes=5000,king=250')
+    parser.add_argument('-b', '--player-b', default='',
+                        help='second engine (same options as -a)')
+    parser.add_argument('--games', type=int,
+                        help='number of games (default: every opening,'
+                        + ' with both colors)')
+    parser.add_argument('--size', type=int, default=8)
+    parser.add_argument('--opening-plies', type=int, default=2)
+    parser.add_argument('--random-plies', type=int, default=0,
+                        help='random moves to play after each opening')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed for --random-plies')
+    parser.add_argument('--max-plies', type=int, default=200,
+                        help='adjudicate a draw after this many plies')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--output', help='PDN file to append games to')
+    parser.add_argument('--report', type=int, default=100,
+                        help='print the standing every N games')
+    parser.set_defaults(func=main)
+
+
+def main(args):
+    try:
+        a = parse_player(args.player_a, 'A')
+        b = parse_player(args.player_b, 'B')
+    except ValueError as e:
+        print(e)
+        return 1
+    if a.name == b.name:
+        print('the players need different names')
+        return 1
+    if args.output:
+        output = open(args.output, 'a')
+    else:
+        output = None
+    try:
+        run_tournament(
+            a, b, size=args.size, opening_plies=args.opening_plies,
+            games=args.games, workers=args.workers,
+            max_plies=args.max_plies, output=output, report=args.report,
+            random_plies=args.random_plies, seed=args.seed)
+    finally:
+        if output is not None:
+            output.close()
+    return 0
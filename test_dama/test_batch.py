@@ -0,0 +1,61 @@
+import random
+
+import pytest
+
+from dama.board import Board, encode_boards, get_geometry
+
+numpy = pytest.importorskip('numpy')
+batch = pytest.importorskip('dama.batch')
+
+
+def sample_boards(size, count, seed=0):
+    rng = random.Random(seed)
+    boards = []
+    for i in range(count):
+        if i % 2:
+            board = Board(size=size)
+            for ply in range(rng.randrange(30)):
+                moves = board.legal_moves()
+                if not moves:
+                    break
+                board.make_move(rng.choice(moves).path)
+        else:
+            pieces = {}
+            for pos in get_geometry(size).squares:
+                c = rng.choice('wbWB.......')
+                if c != '.':
+                    pieces[pos] = c
+            board = Board(size=size, pieces=pieces, player=rng.choice('wb'))
+        boards.append(board)
+    return boards
+
+
+@pytest.mark.parametrize('size', [6, 8, 10, 12])
+def test_matches_boards(size):
+    boards = sample_boards(size, 200)
+    result = batch.analyze(*batch.boards_to_arrays(boards))
+    for n, board in enumerate(boards):
+        movable = board.possible_moves([])
+        assert set(zip(*numpy.nonzero(result.movable[n]))) == movable
+        mobility = sum(len(board.possible_moves([pos])) for pos in movable)
+        assert result.mobility[n] == mobility
+        takes = any(board.get_submoves([pos])[p].take
+                    for pos in movable
+                    for p in board.get_submoves([pos]))
+        assert result.captures[n] == takes
+        pieces = list(board.pieces.values())
+        assert list(result.material[n]) == [pieces.count(c) for c in 'wbWB']
+
+
+@pytest.mark.parametrize('size', [8, 10])
+def test_unpack(size):
+    boards = sample_boards(size, 50)
+    squares, players = batch.unpack(encode_boards(boards), size)
+    expected_squares, expected_players = batch.boards_to_arrays(boards)
+    assert (squares == expected_squares).all()
+    assert (players == expected_players).all()
+
+
+def test_unpack_bad_size():
+    with pytest.raises(ValueError):
+        batch.unpack(encode_boards([Board(size=10)]), 8)
@@ -0,0 +1,105 @@
+from dama.board import Board, openings
+from dama.mcts import MCTS
+from dama import bench
+from dama import book
+from dama import cli
+
+
+def read_table(capsys):
+    # Header line and rows of numbers ('-' for values not measured)
+    lines = capsys.readouterr().out.splitlines()
+    rows = [[value if value == '-' else float(value)
+             for value in line.split()]
+            for line in lines[1:]]
+    return lines[0].split(), rows
+
+
+def test_construct(capsys):
+    bench.construct(sizes=[8, 26], number=1)
+    header, rows = read_table(capsys)
+    assert [row[0] for row in rows] == [8, 26]
+    assert all(len(row) == 4 and min(row[1:]) > 0 for row in rows)
+
+
+def test_cli_unknown(capsys):
+    assert cli.main(['bench', 'nonexistent']) == 1
+
+
+def test_memory(capsys):
+    bench.memory(sizes=[8, 26], count=10)
+    header, rows = read_table(capsys)
+    assert header[1:4] == ['Board', 'BitBoard', 'CompactBoard']
+    for size, board, bitboard, compact in rows:
+        assert 0 < compact < board
+        assert 0 < bitboard < board
+
+
+def test_clone(capsys):
+    bench.clone(sizes=[8], number=1)
+    header, [row] = read_table(capsys)
+    assert row[0] == 8
+    assert len(row) == 5
+    assert min(row[1:]) > 0
+
+
+def test_book_lookup(capsys, tmp_path):
+    bench.book_lookup(plies=2, number=1)
+    lines = capsys.readouterr().out.splitlines()
+    builder = book.BookBuilder(8, 2)
+    for line in openings(8, 2):
+        builder.add_game(line)
+    path = tmp_path / 'expected.book'
+    count = builder.write(path)
+    assert lines[0] == f'{count} entries, {path.stat().st_size} bytes'
+    assert [line.split()[0] for line in lines[1:]] == ['hit', 'miss']
+    assert all(float(line.split()[1]) > 0 for line in lines[1:])
+
+
+def test_evaluate(capsys):
+    bench.evaluate(sizes=[8, 26], positions=2, number=1)
+    header, rows = read_table(capsys)
+    assert header[1:3] == ['evaluate', 'evaluate_from_scratch']
+    assert [row[0] for row in rows] == [8, 26]
+    assert all(min(row[1:]) > 0 for row in rows)
+
+
+def test_king_captures(capsys):
+    bench.king_captures(sizes=[8, 14], max_paths=100)
+    header, rows = read_table(capsys)
+    assert [row[0] for row in rows] == [8, 14]
+    for size, paths, count, listed, groups, moves, group in rows:
+        board = bench.king_capture_board(int(size))
+        capture_groups = board.capture_groups()
+        assert paths == board.count_moves()
+        assert groups == len(capture_groups)
+        assert moves == sum(len(g.moves) for g in capture_groups)
+        assert (listed == '-') == (paths > 100)
+
+
+def test_king_capture_board():
+    board = bench.king_capture_board(14)
+    legal_moves = board.legal_moves()
+    assert board.count_moves() == len(legal_moves) == 463
+    grouped = board.legal_moves(grouped=True)
+    assert len(grouped) == 76
+    assert ({(m.path[0], frozenset(m.taken), m.path[-1]) for m in grouped}
+            == {(m.path[0], frozenset(m.taken), m.path[-1])
+                for m in legal_moves})
+
+
+def test_replay(capsys):
+    bench.replay(sizes=[8], plies=10, repeat=1)
+    header, [row] = read_table(capsys)
+    assert row[0] == 8
+    assert len(row) == 3
+    assert row[1] > 0
+
+
+def test_mcts_playouts(capsys):
+    bench.mcts_playouts(sizes=[8], playouts=5)
+    header, [(size, rate, nodes, bytes_per_node)] = read_table(capsys)
+    expected = MCTS(seed=0).search(Board(), node_limit=5)
+    assert size == 8
+    assert rate > 0
+    assert nodes == expected.tree_nodes
+    assert bytes_per_node == round(expected.tree_bytes / nodes, 1)
@@ -0,0 +1,52 @@
+import random
+
+import pytest
+
+from dama.board import Board, get_geometry
+from dama.bitboard import BitBoard
+
+
+def random_board(rng, size):
+    pieces = {}
+    for pos in get_geometry(size).squares:
+        c = rng.choice('wbWB......')
+        if c != '.':
+            pieces[pos] = c
+    return Board(size=size, pieces=pieces, player=rng.choice('wb'))
+
+
+def compare_prefixes(board, bitboard, prefix):
+    expected = board.get_submoves(prefix)
+    assert bitboard.get_submoves(prefix) == expected
+    for pos in expected:
+        yield from compare_prefixes(board, bitboard, prefix + [pos])
+    if prefix and not expected:
+        yield prefix
+
+
+@pytest.mark.parametrize('size', [6, 7, 8, 10])
+@pytest.mark.parametrize('seed', range(20))
+def test_random_positions(size, seed):
+    rng = random.Random(seed)
+    board = random_board(rng, size)
+    for ply in range(4):
+        bitboard = BitBoard.from_board(board)
+        assert bitboard == board
+        assert bitboard.dump() == board.dump()
+        moves = list(compare_prefixes(board, bitboard, []))
+        assert set(board.legal_moves()) == set(bitboard.legal_moves())
+        assert {m.path for m in board.legal_moves()} == set(map(tuple, moves))
+        if not moves:
+            break
+        move = rng.choice(moves)
+        before = BitBoard.from_board(board)
+        record = board.make_move(move)
+        assert bitboard.make_move(move) == record
+        assert bitboard == board
+        assert bitboard.hash == board.hash == board.compute_hash()
+        board.unmake_move(record)
+        bitboard.unmake_move(record)
+        assert board == bitboard == before
+        assert bitboard.hash == board.hash == before.hash
+        board.make_move(move)
+        bitboard.make_move(move)
@@ -1,11 +1,20 @@
+import random
 import textwrap
 import pytest
 
-from dama.board import Board
+from dama.board import Board, MoveCache, encode_boards, decode_boards
+from dama.board import EvalTerms, pack_terms, unpack_terms, openings
+from dama.bitboard import BitBoard
+from dama.compact import CompactBoard
 
 
-def test_dump():
-    board = Board()
+@pytest.fixture(params=[Board, BitBoard, CompactBoard])
+def board_class(request):
+    return request.param
+
+
+def test_dump(board_class):
+    board = board_class()
     assert board.dump() == textwrap.dedent("""
          [w] abcdefgh
             +--------+
@@ -22,12 +31,12 @@ def test_dump():
     """).lstrip()
 
 
-def test_initial_player():
-    board = Board()
+def test_initial_player(board_class):
+    board = board_class()
     assert board.player == 'w'
 
 
-def test_roundtrip():
+def test_roundtrip(board_class):
     situation = textwrap.dedent("""
          [w] abcdefgh
             +--------+
@@ -42,5 +51,145 @@ def test_roundtrip():
             +--------+
              abcdefgh
     """).lstrip()
-    board = Board.load(situation)
+    board = board_class.load(situation)
     assert board.dump() == situation
+
+
+def test_hash(board_class):
+    board = board_class()
+    assert board.hash == board.compute_hash() == Board().hash
+    assert board.hash != board_class(size=10).hash
+    loaded = board_class.load(board.dump())
+    assert loaded.hash == board.hash
+    loaded.player = 'b'
+    assert loaded.compute_hash() != board.hash
+
+
+def test_shared_move_cache(board_class):
+    cache = MoveCache()
+    board = board_class(move_cache=cache)
+    other = board_class(move_cache=cache)
+    board.possible_moves([(2, 2)])
+    misses = cache.cache_info().misses
+    other.possible_moves([(2, 2)])
+    assert cache.cache_info().misses == misses
+
+    record = board.make_move([(2, 2), (3, 3)])
+    board.unmake_move(record)
+    hits = cache.cache_info().hits
+    board.possible_moves([(2, 2)])
+    assert cache.cache_info().hits > hits
+    assert cache.cache_info().misses == cache.cache_info().currsize
+
+
+def test_clone(board_class):
+    board = board_class()
+    board.make_move([(2, 2), (3, 3)])
+    clone = board.clone()
+    assert type(clone) is board_class
+    assert clone == board
+    assert clone.hash == board.hash
+    assert clone.dump() == board.dump()
+    clone.make_move([(5, 5), (4, 4)])
+    assert clone != board
+    assert board.player == 'b'
+    assert board.pieces[5, 5] == 'b'
+    assert clone.hash == clone.compute_hash()
+    assert board.hash == board.compute_hash()
+
+
+def test_pack_terms():
+    terms = EvalTerms(12, 0, 3, 300, -8450, -1, 2)
+    assert unpack_terms(pack_terms(terms)) == terms
+    assert unpack_terms(pack_terms(terms) - pack_terms(terms[::-1])
+                        + pack_terms([0] * 7)) == EvalTerms(
+        10, 1, 8453, 0, -8453, -1, -10)
+
+
+@pytest.mark.parametrize('size', [8, 10, 12])
+def test_eval_terms(board_class, size):
+    board = board_class(size=size)
+    assert board.terms == EvalTerms(
+        *[len(board.pieces) // 2] * 2, 0, 0, 0, 0, 0)
+    assert board.eval_terms == board.compute_eval_terms()
+    rng = random.Random(size)
+    seen_kings = False
+    for game in range(5):
+        records = []
+        while len(records) < 200:
+            moves = board.legal_moves()
+            if not moves:
+                break
+            records.append(board.make_move(rng.choice(moves).path))
+            assert board.eval_terms == board.compute_eval_terms()
+            assert board.clone().terms == board.terms
+            terms = board.terms
+            seen_kings |= bool(terms.white_kings or terms.black_kings)
+        for record in reversed(records):
+            board.unmake_move(record)
+            assert board.eval_terms == board.compute_eval_terms()
+        assert board == board_class(size=size)
+    assert seen_kings
+
+
+def test_move_cache_eviction():
+    cache = MoveCache(maxsize=2)
+    cache['a'] = 1
+    cache['b'] = 2
+    assert cache['a'] == 1
+    cache['c'] = 3
+    with pytest.raises(KeyError):
+        cache['b']
+    assert cache['a'] == 1
+    assert cache.cache_info() == (2, 1, 1, 2, 2)
+
+
+@pytest.mark.parametrize('size', [6, 8, 10, 12])
+def test_bytes_roundtrip(board_class, size):
+    board = board_class(size=size)
+    for move in board.legal_moves()[:1]:
+        board.make_move(move.path)
+    data = board.to_bytes()
+    assert data[0] == size
+    loaded = board_class.from_bytes(data)
+    assert loaded == board
+    assert loaded.hash == board.hash
+
+
+def test_bytes_compact():
+    situation = """[b]
+        | b b B b|
+        |b w b . |
+        | b b B b|
+        |. . w b |
+        | . B . .|
+        |w B w W |
+        | w w W b|
+        |w B w w |
+    """
+    board = Board.load(situation)
+    assert len(board.to_bytes()) == 11
+    assert Board.from_bytes(board.to_bytes()).dump() == board.dump()
+
+
+def test_bytes_bad_data():
+    data = bytearray(Board().to_bytes())
+    data[-1] = 0xff
+    with pytest.raises(ValueError):
+        Board.from_bytes(data)
+
+
+def test_bulk_encoding(board_class):
+    boards = [board_class(size=size) for size in (8, 10, 8, 6)]
+    boards[1].player = 'b'
+    boards[1].hash = boards[1].compute_hash()
+    buffer = encode_boards(boards)
+    assert len(buffer) == 11 + 16 + 11 + 7
+    decoded = list(decode_boards(buffer, board_class))
+    assert decoded == boards
+    assert all(type(b) is board_class for b in decoded)
+
+
+def test_openings():
+    assert len(openings(8, 1)) == 7
+    assert len(openings(8, 2)) == 49
@@ -0,0 +1,175 @@
+import io
+import random
+
+import pytest
+
+from dama.board import Board, openings
+from dama.engine import Engine
+from dama import book
+from dama import cli
+from dama import common
+from dama import pdn
+from dama import tournament
+
+
+def play(paths):
+    board = Board()
+    records = [board.make_move(path) for path in paths]
+    return board, records
+
+
+@pytest.fixture
+def builder():
+    builder = book.BookBuilder(max_plies=2)
+    first, second = openings(8, 2)[:2]
+    builder.add_game(first, '1-0')
+    builder.add_game(first, '0-1')
+    builder.add_game(first, '1-0')
+    builder.add_game(second, '1/2-1/2')
+    return builder
+
+
+@pytest.fixture
+def book_path(tmp_path, builder):
+    path = tmp_path / 'test.book'
+    builder.write(path)
+    return path
+
+
+def test_lookup(book_path):
+    first, second = openings(8, 2)[:2]
+    with book.Book(book_path) as opening_book:
+        assert len(opening_book) == 3
+        [move] = opening_book.lookup(Board())
+        assert move == book.BookMove(first[0], 4, pytest.approx(0.625))
+        board, records = play(first[:1])
+        assert opening_book.lookup(board) == [
+            book.BookMove(first[1], 3, pytest.approx(1 / 3, abs=1e-3)),
+            book.BookMove(second[1], 1, 0.5),
+        ]
+        board, records = play(first)
+        assert opening_book.lookup(board) == []
+        assert opening_book.lookup(Board(size=10)) == []
+
+
+def test_lookup_random_games(tmp_path):
+    rng = random.Random(0)
+    builder = book.BookBuilder(max_plies=8)
+    expected = {}
+    for i in range(30):
+        board = Board()
+        paths = []
+        for ply in range(8):
+            moves = board.legal_moves()
+            path = rng.choice(moves).path
+            expected.setdefault(board.hash, set()).add(path)
+            paths.append(path)
+            board.make_move(path)
+        assert builder.add_game(paths) == 8
+    path = tmp_path / 'random.book'
+    builder.write(path)
+    with book.Book(path) as opening_book:
+        for i in range(30):
+            board = Board()
+            while True:
+                moves = {move.path for move in opening_book.lookup(board)}
+                assert moves == expected.get(board.hash, set())
+                if not moves:
+                    break
+                board.make_move(rng.choice(sorted(moves)))
+
+
+def test_choose(book_path):
+    first, second = openings(8, 2)[:2]
+    board, records = play(first[:1])
+    with book.Book(book_path) as opening_book:
+        assert opening_book.choose(board).path == first[1]
+        rng = random.Random(0)
+        chosen = {opening_book.choose(board, rng).path for i in range(50)}
+        assert chosen == {first[1], second[1]}
+        assert opening_book.choose(Board(size=10)) is None
+
+
+def test_illegal_moves_skipped():
+    builder = book.BookBuilder()
+    first = openings(8, 1)[0]
+    assert builder.add_game([first[0], first[0]]) == 1
+    assert builder.games == 1
+    assert len(builder.stats) == 1
+
+
+def test_bad_file(tmp_path):
+    path = tmp_path / 'bad.book'
+    path.write_bytes(b'not a book at all')
+    with pytest.raises(ValueError):
+        book.Book(path)
+
+
+def test_engine_with_book(book_path):
+    first = openings(8, 1)[0]
+    results = []
+    with book.Book(book_path) as opening_book:
+        engine = Engine(book=opening_book)
+        result = engine.search(Board(), depth=6, callback=results.append)
+        assert result.move == first[0]
+        assert result.depth == result.nodes == 0
+        assert results == [result]
+        board, records = play(openings(8, 2)[0])
+        assert engine.search(board, depth=1).nodes > 0
+
+
+def test_add_pdn():
+    first = openings(8, 2)[0]
+    board, records = play(first)
+    out = io.StringIO()
+    pdn.write_game(out, records, result='0-1')
+    pdn.write_game(out, records[:1], result='1-0')
+    large = Board(size=10)
+    large_records = [large.make_move(large.legal_moves()[0].path)]
+    pdn.write_game(out, large_records, result='1-0', size=10)
+    builder = book.BookBuilder()
+    builder.add_pdn(io.StringIO(out.getvalue()))
+    assert builder.games == 2
+    assert builder.stats[Board().hash, first[0]] == [2, 1]
+
+
+def test_selfplay():
+    builder = book.BookBuilder(max_plies=4)
+    player = tournament.parse_player('depth=1', 'selfplay')
+    tournament.selfplay(builder, 2, player, max_plies=10, workers=1)
+    assert builder.games == 2
+    assert sum(weight for weight, score in builder.stats.values()) == 8
+
+
+def test_selfplay_random_plies(capsys):
+    # Two opening plies give 49 lines; more games only repeat them
+    # unless random plies are added
+    player = tournament.parse_player('depth=1', 'selfplay')
+    builder = book.BookBuilder(max_plies=4)
+    tournament.selfplay(builder, 50, player, max_plies=4, workers=2)
+    assert builder.games == 49
+    assert 'only 49 distinct games' in capsys.readouterr().out
+    builder = book.BookBuilder(max_plies=4)
+    tournament.selfplay(builder, 50, player, max_plies=4, workers=2,
+                        random_plies=2, seed=1)
+    assert builder.games == 50
+
+
+def test_cli(tmp_path, capsys):
+    board, records = play(openings(8, 2)[0])
+    archive = tmp_path / 'games.pdn'
+    with open(archive, 'w') as f:
+        pdn.write_game(f, records, result='1-0')
+    path = tmp_path / 'cli.book'
+    assert cli.main(['book', 'build', str(path), '--pdn', str(archive)]) == 0
+    assert '2 entries from 1 games' in capsys.readouterr().out
+    assert cli.main(['book', 'probe', str(path)]) == 0
+    name = '-'.join(common.coord_name(*pos) for pos in records[0].path)
+    assert capsys.readouterr().out == f'{name} weight 1 score 1.000\n'
+    diagram = tmp_path / 'board.txt'
+    diagram.write_text(board.dump())
+    assert cli.main(['book', 'probe', str(path),
+                     '--file', str(diagram)]) == 1
+    assert capsys.readouterr().out == 'position not in book\n'
+    assert cli.main(['search', '--book', str(path), '--depth', '3']) == 0
+    assert name in capsys.readouterr().out
@@ -1,3 +1,7 @@
+import io
+import subprocess
+import sys
+
 from dama import cli
 
 import pytest
@@ -22,3 +26,78 @@ import pytest
 def test_coord_name(x, y, name):
     assert cli.coord_name(x, y) == name
     assert cli.coord_from_name(name) == (x, y)
+
+
+def test_batch(tmp_path, capsys):
+    path = tmp_path / 'moves.txt'
+    path.write_text('1. c3-d4 f6-e5\n2. d4xf6 g7xe5\n')
+    assert cli.main(['--batch', str(path)]) == 0
+    assert capsys.readouterr().out == ''
+    assert cli.main(['--batch', str(path), '--show', '--trace']) == 0
+    out = capsys.readouterr().out
+    lines = out.splitlines()
+    assert lines[0].startswith('1 c3-d4 ')
+    assert lines[3].startswith('4 g7xe5 ')
+    assert lines[4] == '[w] abcdefgh'
+    assert ' 5 |. . b . | 5' in lines
+
+
+@pytest.mark.parametrize(['moves', 'message'], [
+    ('c3-d4 f6-e5 d4-f6', 'illegal move 3: d4-f6\n'),
+    ('c3-d4 f6-e5 c1-d2', 'illegal move 3: c1-d2\n'),
+    ('c3xd4', 'illegal move 1: c3xd4\n'),
+    ('c3-d4 ??', 'illegal move 2: ??\n'),
+])
+def test_batch_illegal(tmp_path, capsys, moves, message):
+    path = tmp_path / 'moves.txt'
+    path.write_text(moves)
+    assert cli.main(['--batch', str(path)]) == 1
+    assert capsys.readouterr().err == message
+
+
+def test_batch_stdin(monkeypatch, tmp_path, capsys):
+    start = tmp_path / 'start.txt'
+    start.write_text("""[w]
+        | . . . .|
+        |B . . . |
+        | . . . .|
+        |. . . . |
+        | . . . .|
+        |. . . . |
+        | . . . .|
+        |W . . . |
+    """)
+    monkeypatch.setattr('sys.stdin', io.StringIO(
+        'a1-b2 a7-b8 b2-a1 b8-a7\n' * 1000))
+    assert cli.main(['--batch', '-', '--start', str(start), '--trace']) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 4000
+    assert lines[3].split()[2] == lines[-1].split()[2]
+
+
+def test_batch_with_command():
+    with pytest.raises(SystemExit):
+        cli.main(['--batch', 'x', 'perft', '1'])
+
+
+@pytest.mark.parametrize('module', [
+    'common', 'engine', 'book', 'mcts', 'parallel', 'pdn', 'perft', 'server',
+    'tablebase', 'thinker', 'tournament'])
+def test_import_alone(module):
+    subprocess.run([sys.executable, '-c', f'import dama.{module}'],
+                   check=True)
+
+
+@pytest.mark.parametrize(['module', 'expected'], [
+    ('engine', 'board common engine'),
+    ('book', 'board book common pdn'),
+])
+def test_import_dependencies(module, expected):
+    # The engine and the book don't pull in the command line, the
+    # tournament runner or anything else they don't use
+    code = (f'import sys, dama.{module}; '
+            + 'print(*sorted(m[5:] for m in sys.modules'
+            + ' if m.startswith("dama.")))')
+    result = subprocess.run([sys.executable, '-c', code],
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.split() == expected.split()
@@ -0,0 +1,37 @@
+import argparse
+
+import pytest
+
+from dama.board import Board
+from dama.compact import CompactBoard
+from dama import common
+
+
+@pytest.mark.parametrize('size', [2, 8, common.MAX_SIZE])
+def test_coord_names(size):
+    board = Board(size=size)
+    names = {common.coord_name(*pos) for pos in board.valid_coords}
+    assert len(names) == len(board.valid_coords)
+    for pos in board.valid_coords:
+        assert common.coord_from_name(common.coord_name(*pos)) == pos
+
+
+def test_coord_name_corners():
+    size = common.MAX_SIZE
+    assert common.coord_name(0, 0) == 'a1'
+    assert common.coord_name(size - 1, size - 1) == 'z26'
+    assert common.coord_from_name('z26') == (size - 1, size - 1)
+
+
+def test_board_from_args(tmp_path):
+    args = argparse.Namespace(file=None, size=10)
+    assert common.board_from_args(args) == Board(size=10)
+    board = common.board_from_args(args, CompactBoard)
+    assert isinstance(board, CompactBoard)
+    assert board.size == 10
+    diagram = Board()
+    diagram.make_move(diagram.legal_moves()[0].path)
+    path = tmp_path / 'board.txt'
+    path.write_text(diagram.dump())
+    args = argparse.Namespace(file=str(path), size=8)
+    assert common.board_from_args(args) == diagram
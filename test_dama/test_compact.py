@@ -0,0 +1,68 @@
+import random
+import tracemalloc
+
+import pytest
+
+from dama.board import Board, MoveCache
+from dama.compact import CompactBoard
+
+from test_dama.test_bitboard import random_board, compare_prefixes
+
+
+@pytest.mark.parametrize('size', [6, 7, 8, 10])
+@pytest.mark.parametrize('seed', range(20))
+def test_random_positions(size, seed):
+    rng = random.Random(seed)
+    board = random_board(rng, size)
+    for ply in range(4):
+        compact = CompactBoard.from_board(board)
+        assert compact == board
+        assert compact.hash == board.hash
+        assert compact.to_bytes() == board.to_bytes()
+        moves = list(compare_prefixes(board, compact, []))
+        assert set(board.legal_moves()) == set(compact.legal_moves())
+        if not moves:
+            break
+        move = rng.choice(moves)
+        before = compact.clone()
+        record = board.make_move(move)
+        assert compact.make_move(move) == record
+        assert compact == board
+        assert compact.hash == board.hash == compact.compute_hash()
+        compact.unmake_move(record)
+        assert compact == before
+        assert compact.hash == before.hash
+        compact.make_move(move)
+
+
+def test_no_instance_dict():
+    board = CompactBoard()
+    assert not hasattr(board, '__dict__')
+    assert not hasattr(Board(), '__dict__')
+    with pytest.raises(AttributeError):
+        board.extra = 1
+
+
+def test_shares_geometry():
+    board = CompactBoard(size=10)
+    other = CompactBoard(size=10)
+    assert board._compact is other._compact
+    assert board.valid_coords is other.valid_coords
+    assert board.cells is not other.cells
+    assert board.clone().cells is not board.cells
+
+
+def allocated(make, count=1000):
+    tracemalloc.start()
+    try:
+        boards = [make() for i in range(count)]
+        return tracemalloc.get_traced_memory()[0] / len(boards)
+    finally:
+        tracemalloc.stop()
+
+
+def test_smaller_than_board():
+    cache = MoveCache()
+    board_size = allocated(lambda: Board(move_cache=cache))
+    compact_size = allocated(lambda: CompactBoard(move_cache=cache))
+    assert compact_size * 4 < board_size
@@ -0,0 +1,132 @@
+import random
+
+import pytest
+
+from dama.board import Board
+from dama.bitboard import BitBoard
+from dama.compact import CompactBoard
+from dama.engine import Engine, evaluate, evaluate_from_scratch, WIN
+from dama import cli
+
+
+def negamax(board, depth, ply=0):
+    moves = board.legal_moves()
+    if not moves:
+        return -WIN + ply
+    if depth <= 0 and not moves[0].taken:
+        return evaluate(board)
+    best = -WIN - 1
+    for move in moves:
+        record = board.make_move(move.path)
+        best = max(best, -negamax(board, depth - 1, ply + 1))
+        board.unmake_move(record)
+    return best
+
+
+@pytest.mark.parametrize('board_class', [Board, BitBoard, CompactBoard])
+@pytest.mark.parametrize('depth', [1, 2, 3, 4])
+def test_matches_negamax(board_class, depth):
+    board = board_class.load("""[w]
+        | . . . .|
+        |. . . b |
+        | . . . .|
+        |. . W . |
+        | . . . .|
+        |. b . b |
+        | . . w .|
+        |. . . . |
+    """)
+    before = board.dump()
+    result = Engine().search(board, depth=depth)
+    assert result.depth == depth
+    assert result.score == negamax(board, depth)
+    assert board.dump() == before
+    assert board.hash == board.compute_hash()
+
+
+@pytest.mark.parametrize('board_class', [Board, BitBoard, CompactBoard])
+@pytest.mark.parametrize('size', [8, 10, 12])
+def test_evaluate_from_scratch(board_class, size):
+    rng = random.Random(size)
+    weights = dict(piece_values={'w': 90, 'b': 110, 'W': 250, 'B': 350},
+                   advance_value=3, center_value=7, back_rank_value=-2)
+    for game in range(5):
+        board = board_class(size=size)
+        for ply in range(100):
+            assert evaluate(board) == evaluate_from_scratch(board)
+            assert (evaluate(board, **weights)
+                    == evaluate_from_scratch(board, **weights))
+            moves = board.legal_moves()
+            if not moves:
+                break
+            board.make_move(rng.choice(moves).path)
+
+
+def test_start_position():
+    board = Board()
+    result = Engine().search(board, depth=4)
+    assert result.score == negamax(board, 4)
+    assert result.move in {m.path for m in board.legal_moves()}
+    assert result.nodes > 0
+    assert result.nps > 0
+
+
+def test_finds_win():
+    board = Board.load("""[w]
+        | . . . .|
+        |. . . . |
+        | . . . .|
+        |. . . . |
+        | . . . .|
+        |. . b . |
+        | . . . .|
+        |. . . W |
+    """)
+    result = Engine().search(board, depth=10)
+    assert result.score == WIN - 1
+    assert result.move[0] == (6, 0)
+    board.make_move(result.move)
+    assert board.legal_moves() == []
+
+
+def test_no_moves():
+    board = Board.load("""[w]
+        | . . . .|
+        |. . . . |
+        | . . . .|
+        |. . . . |
+        | . . . .|
+        |. . . . |
+        | . . . .|
+        |. . b . |
+    """)
+    result = Engine().search(board, depth=3)
+    assert result.move is None
+    assert result.score == -WIN
+
+
+def test_node_limit():
+    result = Engine().search(Board(), node_limit=3000)
+    assert 1 <= result.depth < 100
+    assert result.move is not None
+    assert result.nodes < 3000 + 1024
+
+
+def test_time_limit():
+    result = Engine().search(Board(), time_limit=0.2)
+    assert result.move is not None
+    assert result.elapsed < 2
+
+
+def test_stop():
+    engine = Engine()
+    result = engine.search(Board(), stop=lambda: engine.nodes >= 5000)
+    assert result.move is not None
+    assert result.nodes < 5000 + 1024
+
+
+def test_cli(capsys):
+    assert cli.main(['search', '--depth', '3']) == 0
+    out = capsys.readouterr().out
+    assert 'depth 3:' in out
+    assert 'nodes/s' in out
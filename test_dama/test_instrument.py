@@ -0,0 +1,97 @@
+import json
+
+import pytest
+
+from dama.board import Board, MoveCache
+from dama.bitboard import BitBoard
+from dama import cli
+from dama import instrument
+
+
+@pytest.fixture
+def instrumented():
+    instrument.reset()
+    with instrument.instrumented():
+        yield
+    instrument.reset()
+
+
+def test_disabled_is_untouched():
+    before = {name: vars(Board)[name] for name in instrument.METHODS}
+    lookup = MoveCache.__getitem__
+    with instrument.instrumented():
+        assert instrument.is_enabled()
+        assert Board.make_move is not before['make_move']
+        assert MoveCache.__getitem__ is not lookup
+    assert not instrument.is_enabled()
+    for name, func in before.items():
+        assert vars(Board)[name] is func
+    assert MoveCache.__getitem__ is lookup
+
+
+@pytest.mark.parametrize(['board_class', 'lengths'], [
+    # Board looks at every piece's moves to find the movable ones
+    (Board, {'0': 1, '1': 12, '2': 1}),
+    (BitBoard, {'0': 1, '1': 1, '2': 1}),
+])
+def test_counts(instrumented, board_class, lengths):
+    board = board_class()
+    assert board.move_finished([(2, 2), (3, 3)])
+    data = instrument.report()
+    assert data['submoves_by_prefix_length'] == lengths
+    assert data['calls']['_get_submoves'] == sum(lengths.values())
+    assert data['move_cache']['misses'] == sum(lengths.values())
+    assert data['calls']['get_jumped'] >= 1
+    assert data['calls']['_get_steps'] >= 1
+    assert all(t >= 0 for t in data['seconds'].values())
+
+
+@pytest.mark.parametrize('board_class', [Board, BitBoard])
+def test_make_move_counts(instrumented, board_class):
+    board = board_class()
+    board.make_move([(2, 2), (3, 3)])
+    data = instrument.report()
+    assert data['calls']['make_move'] == 1
+    assert data['calls']['_check_move'] == 1
+    assert data['calls']['_get_steps'] == 1
+    assert data['calls']['_get_submoves'] == 0
+    assert data['move_cache'] == {'hits': 0, 'misses': 0}
+
+
+def test_cache_hits(instrumented):
+    board = BitBoard()
+    board.possible_moves([])
+    board.possible_moves([])
+    data = instrument.report()
+    assert data['move_cache'] == {'hits': 1, 'misses': 1}
+
+
+def test_reset(instrumented):
+    Board().legal_moves()
+    assert instrument.report()['calls']['_get_steps'] == 12
+    instrument.reset()
+    assert instrument.report()['calls']['_get_steps'] == 0
+
+
+def test_format_report(instrumented):
+    board = BitBoard()
+    board.move_finished([(2, 2), (3, 3)])
+    board.get_jumped([(2, 2), (3, 3)])
+    board.make_move([(2, 2), (3, 3)])
+    text = instrument.format_report(instrument.report())
+    assert 'make_move' in text
+    assert '_get_submoves by prefix length: 0: 1, 1: 1, 2: 1' in text
+    assert 'move cache: 1 hits, 3 misses (25.0% hit rate)' in text
+
+
+def test_cli_json(capsys):
+    assert cli.main(['--instrument', 'json', 'perft', '2']) == 0
+    out = capsys.readouterr().out
+    data = json.loads(out[out.index('{'):])
+    assert data['calls']['make_move'] > 0
+    assert not instrument.is_enabled()
+
+
+def test_cli_text(capsys):
+    assert cli.main(['--instrument', 'text', 'perft', '2']) == 0
+    assert 'move cache:' in capsys.readouterr().out
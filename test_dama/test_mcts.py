@@ -0,0 +1,140 @@
+import functools
+
+import pytest
+
+from dama.board import Board, Move, openings
+from dama.mcts import MCTS, Tree
+from dama import cli
+from dama import engine
+from dama import pdn
+from dama import tournament
+
+
+def test_tree():
+    tree = Tree(8)
+    assert len(tree) == 1
+    assert tree.children(0) == range(0)
+    moves = [Move(((0, 2), (1, 3)), []),
+             Move(((2, 2), (4, 4), (6, 6)), [(3, 3), (5, 5)])]
+    tree.expand(0, moves)
+    assert len(tree) == 3
+    assert [tree.legal_move(node) for node in tree.children(0)] == moves
+    assert tree.move(2) == moves[1].path
+    assert list(tree.parent) == [-1, 0, 0]
+    tree.expand(2, [Move(((1, 5), (0, 4)), [])])
+    assert tree.children(2) == range(3, 4)
+    assert tree.move(3) == ((1, 5), (0, 4))
+    assert tree.nbytes() > 0
+
+
+def test_start_position():
+    board = Board()
+    before = board.dump()
+    result = MCTS(seed=0).search(board, node_limit=200)
+    assert board.dump() == before
+    assert result.move in {m.path for m in board.legal_moves()}
+    assert result.playouts == result.nodes == 200
+    assert 1 < result.tree_nodes <= 201 + 7 * 200
+    assert 0 <= result.win_rate <= 1
+    assert result.nps > 0
+
+
+def test_finds_win():
+    board = Board.load("""[w]
+        | . . . .|
+        |. . . . |
+        | . . . .|
+        |. . . . |
+        | . . . .|
+        |. . b . |
+        | . . . .|
+        |. . . W |
+    """)
+    result = MCTS(seed=0).search(board, node_limit=50)
+    assert result.move[0] == (6, 0)
+    assert result.win_rate == 1
+    board.make_move(result.move)
+    assert board.legal_moves() == []
+
+
+def test_no_moves():
+    board = Board.load("""[w]
+        | . . . .|
+        |. . . . |
+        | . . . .|
+        |. . . . |
+        | . . . .|
+        |. . . . |
+        | . . . .|
+        |. . b . |
+    """)
+    result = MCTS().search(board, node_limit=100)
+    assert result.move is None
+    assert result.playouts == 1
+
+
+def test_seed():
+    first = MCTS(seed=1).search(Board(), node_limit=100)
+    second = MCTS(seed=1).search(Board(), node_limit=100)
+    assert first.move == second.move
+    assert first.tree_nodes == second.tree_nodes
+
+
+def test_limits():
+    result = MCTS(seed=0).search(Board(), time_limit=0.2)
+    assert result.move is not None
+    assert result.elapsed < 2
+    mcts = MCTS(seed=0, max_nodes=50)
+    assert mcts.search(Board(), node_limit=100).tree_nodes < 50 + 10
+    result = mcts.search(Board(), stop=lambda: len(mcts.tree) > 20)
+    assert result.playouts < 10
+    result = mcts.search(Board(), depth=1, node_limit=50)
+    assert result.tree_nodes == 8
+
+
+def test_workers():
+    result = MCTS(seed=0, workers=2).search(Board(), node_limit=100)
+    assert result.playouts == 100
+    assert result.move in {m.path for m in Board().legal_moves()}
+    assert result.tree_nodes > 2 * 7
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_evaluate(workers):
+    # With playout_plies=0, `evaluate` decides every playout; white is
+    # two men up
+    pieces = Board().pieces
+    del pieces[1, 7], pieces[3, 7]
+    board = Board(pieces=pieces)
+    result = MCTS(seed=0, workers=workers, playout_plies=0).search(
+        board, node_limit=50)
+    assert result.win_rate == 1
+    negated = {c: -value for c, value in engine.PIECE_VALUES.items()}
+    evaluate = functools.partial(engine.evaluate, piece_values=negated)
+    result = MCTS(seed=0, workers=workers, playout_plies=0,
+                  evaluate=evaluate).search(board, node_limit=50)
+    assert result.win_rate == 0
+
+
+def test_workers_stop():
+    with pytest.raises(ValueError):
+        MCTS(workers=2).search(Board(), stop=lambda: True)
+
+
+def test_tournament_player():
+    a = tournament.parse_player('search=mcts,nodes=20', 'A')
+    b = tournament.parse_player('depth=1', 'B')
+    assert isinstance(tournament.make_engine(a), MCTS)
+    opening = openings(8, 2)[0]
+    game = tournament.play_game(0, 0, opening, a, b, 8, 10)
+    assert game.result in pdn.SCORES
+    assert len(game.records) == 10
+    with pytest.raises(ValueError):
+        tournament.parse_player('search=minimax', 'A')
+
+
+def test_cli(capsys):
+    assert cli.main(['mcts', '--playouts', '50', '--seed', '0']) == 0
+    out = capsys.readouterr().out
+    assert 'playouts 50 ' in out
+    assert 'playouts/s' in out
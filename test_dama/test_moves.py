@@ -1,9 +1,49 @@
+import random
+
 import pytest
 
-from dama.board import Board
+from dama.board import Board, Move
+from dama.bitboard import BitBoard
+from dama.compact import CompactBoard
 from dama import cli
 
 
+@pytest.fixture(params=[Board, BitBoard, CompactBoard])
+def board_class(request):
+    return request.param
+
+
+def moves_by_prefix(board, prefix):
+    submoves = board.possible_moves(prefix)
+    if prefix and not submoves:
+        yield Move(tuple(prefix), tuple(board.get_jumped(prefix)))
+    for pos in submoves:
+        yield from moves_by_prefix(board, prefix + [pos])
+
+
+def outcome(move):
+    return move.path[0], frozenset(move.taken), move.path[-1]
+
+
+def check_legal_moves(board):
+    legal_moves = board.legal_moves()
+    assert len(legal_moves) == len(set(legal_moves))
+    assert set(legal_moves) == set(moves_by_prefix(board, []))
+    check_grouped(board, legal_moves)
+
+
+def check_grouped(board, legal_moves):
+    assert board.count_moves() == len(legal_moves)
+    grouped = board.legal_moves(grouped=True)
+    assert set(grouped) <= set(legal_moves)
+    assert len({outcome(move) for move in grouped}) == len(grouped)
+    assert ({outcome(move) for move in grouped}
+            == {outcome(move) for move in legal_moves})
+    for group in board.capture_groups():
+        for move in group.moves:
+            assert outcome(move)[:2] == (group.start, group.taken)
+
+
 def check_prefix(board, prefix, expected):
     prefix = [cli.coord_from_name(n) for n in prefix]
     print(board.dump())
@@ -11,6 +51,8 @@ def check_prefix(board, prefix, expected):
     got = {cli.coord_name(*m) for m in moves}
     print('->', got)
     assert got == set(expected)
+    if not prefix:
+        check_legal_moves(board)
     if expected:
         assert not board.move_finished(prefix)
     else:
@@ -26,31 +68,32 @@ def check_move(board, instruction, expected):
     assert board.player == expect_board.player
     assert board.pieces == expect_board.pieces
     assert board == expect_board
+    assert board.hash == board.compute_hash() == expect_board.hash
 
 
-def test_initial():
-    board = Board()
+def test_initial(board_class):
+    board = board_class()
     check_prefix(board, [], {'a3', 'c3', 'e3', 'g3'})
 
 
-def test_subsequent():
-    board = Board()
+def test_subsequent(board_class):
+    board = board_class()
     check_prefix(board, ['c3'], {'b4', 'd4'})
 
 
-def test_ending():
-    board = Board()
+def test_ending(board_class):
+    board = board_class()
     check_prefix(board, ['c3', 'd4'], {})
 
 
-def test_illegal():
-    board = Board()
+def test_illegal(board_class):
+    board = board_class()
     with pytest.raises(ValueError):
         check_prefix(board, ['a1'], {})
 
 
-def test_choice():
-    board = Board.load("""[w]
+def test_choice(board_class):
+    board = board_class.load("""[w]
         | . . . .|
         |. . . . |
         | . . . .|
@@ -64,8 +107,8 @@ def test_choice():
     check_prefix(board, ['e1'], {'c3', 'g3'})
 
 
-def test_jump_self():
-    board = Board.load("""[w]
+def test_jump_self(board_class):
+    board = board_class.load("""[w]
         | . . . .|
         |. . . . |
         | . . . .|
@@ -78,8 +121,8 @@ def test_jump_self():
     check_prefix(board, [], {'d2', 'f2'})
 
 
-def test_jump_opponent():
-    board = Board.load("""[w]
+def test_jump_opponent(board_class):
+    board = board_class.load("""[w]
         | . . . .|
         |. . . . |
         | . . . .|
@@ -93,8 +136,8 @@ def test_jump_opponent():
     check_prefix(board, ['e1'], {'g3'})
 
 
-def test_no_choice():
-    board = Board.load("""[w]
+def test_no_choice(board_class):
+    board = board_class.load("""[w]
         | . . . .|
         |. . . . |
         | . . . .|
@@ -109,8 +152,8 @@ def test_no_choice():
     check_prefix(board, ['e1', 'c3'], {})
 
 
-def test_no_jump_after_move():
-    board = Board.load("""[w]
+def test_no_jump_after_move(board_class):
+    board = board_class.load("""[w]
         | . . . .|
         |. . . . |
         | . . . .|
@@ -125,8 +168,8 @@ def test_no_jump_after_move():
     check_prefix(board, ['e1', 'd2'], {})
 
 
-def test_chain():
-    board = Board.load("""[w]
+def test_chain(board_class):
+    board = board_class.load("""[w]
         | . b . .|
         |. . b . |
         | . b b .|
@@ -154,8 +197,8 @@ def test_chain():
     """)
 
 
-def test_upgrade():
-    board = Board.load("""[w]
+def test_upgrade(board_class):
+    board = board_class.load("""[w]
         | . . . .|
         |. . w . |
         | . . . .|
@@ -192,8 +235,8 @@ def test_upgrade():
     """)
 
 
-def test_king():
-    board = Board.load("""[w]
+def test_king(board_class):
+    board = board_class.load("""[w]
         | . . . .|
         |. . . . |
         | . . . .|
@@ -208,8 +251,8 @@ def test_king():
                                  'f4', 'g3', 'h2', 'b8', 'c7', 'd6'})
 
 
-def test_king_take():
-    board = Board.load("""[w]
+def test_king_take(board_class):
+    board = board_class.load("""[w]
         | . . . .|
         |. . . W |
         | . . . .|
@@ -223,8 +266,8 @@ def test_king_take():
     check_prefix(board, ['g7'], {'a1', 'b2'})
 
 
-def test_king_choice():
-    board = Board.load("""[w]
+def test_king_choice(board_class):
+    board = board_class.load("""[w]
         | . . . .|
         |. . . b |
         | . . . .|
@@ -238,8 +281,8 @@ def test_king_choice():
     check_prefix(board, ['e5'], {'a1', 'b2', 'h8', 'h2'})
 
 
-def test_king_lose():
-    board = Board.load("""[w]
+def test_king_lose(board_class):
+    board = board_class.load("""[w]
         | . . . .|
         |. . . . |
         | . . . .|
@@ -278,8 +321,8 @@ def test_king_lose():
     check_prefix(board, [], {})
 
 
-def test_king_chain():
-    board = Board.load("""[w]
+def test_king_chain(board_class):
+    board = board_class.load("""[w]
         | . . . .|
         |. b . . |
         | . . b .|
@@ -309,8 +352,8 @@ def test_king_chain():
     """)
 
 
-def test_king_return():
-    board = Board.load("""[w]
+def test_king_return(board_class):
+    board = board_class.load("""[w]
         | . . . .|
         |. b b . |
         | W . . .|
@@ -339,8 +382,8 @@ def test_king_return():
     """)
 
 
-def test_promotion_ends_turn():
-    board = Board.load("""[w]
+def test_promotion_ends_turn(board_class):
+    board = board_class.load("""[w]
         | . . . .|
         |. b b . |
         | w . . .|
@@ -354,8 +397,8 @@ def test_promotion_ends_turn():
     check_prefix(board, ['b6'], {'d8'})
     check_prefix(board, ['b6', 'd8'], {})
 
-def test_basic_jump():
-    board = Board.load("""[w]
+def test_basic_jump(board_class):
+    board = board_class.load("""[w]
         | b b . .|
         |b . b . |
         | . . . .|
@@ -369,3 +412,118 @@ def test_basic_jump():
     check_prefix(board, ['a3'], {'c5'})
     check_prefix(board, ['a3', 'c5'], {})
 
+
+def test_legal_moves_king_chain(board_class):
+    board = board_class.load("""[w]
+        | . . . .|
+        |. b . . |
+        | . . b .|
+        |. . . . |
+        | b w . b|
+        |. . b . |
+        | b . . .|
+        |W . . . |
+    """)
+    moves = {'-'.join(cli.coord_name(*p) for p in move.path):
+             {cli.coord_name(*p) for p in move.taken}
+             for move in board.legal_moves()}
+    assert moves == {
+        'a1-c3-a5-d8-g5-d2': {'b2', 'b4', 'c7', 'f6', 'e3'},
+        'a1-c3-a5-d8-g5-c1': {'b2', 'b4', 'c7', 'f6', 'e3'},
+    }
+
+
+def test_capture_groups(board_class):
+    board = board_class.load("""[w]
+        | . . . .|
+        |. b . . |
+        | . . b .|
+        |. . . . |
+        | b w . b|
+        |. . b . |
+        | b . . .|
+        |W . . . |
+    """)
+    [group] = board.capture_groups()
+    assert cli.coord_name(*group.start) == 'a1'
+    assert {cli.coord_name(*p) for p in group.taken} == {
+        'b2', 'b4', 'c7', 'f6', 'e3'}
+    assert {cli.coord_name(*move.path[-1]) for move in group.moves} == {
+        'd2', 'c1'}
+    assert board_class(size=8).capture_groups() == []
+
+
+def test_grouped_random_games(board_class):
+    rng = random.Random(0)
+    for game in range(10):
+        board = board_class(size=rng.choice([8, 10, 12]))
+        for ply in range(150):
+            legal_moves = board.legal_moves()
+            check_grouped(board, legal_moves)
+            if not legal_moves:
+                break
+            board.make_move(rng.choice(legal_moves).path)
+
+
+def test_make_move_checks(board_class):
+    rng = random.Random(1)
+    for game in range(5):
+        board = board_class(size=rng.choice([8, 10]))
+        squares = sorted(board.valid_coords)
+        for ply in range(100):
+            legal = {move.path for move in board.legal_moves()}
+            if not legal:
+                break
+            candidates = set(legal)
+            for path in legal:
+                candidates.add(path[:-1])
+                candidates.add(path + (rng.choice(squares),))
+                candidates.add(path[:-1] + (rng.choice(squares),))
+            for i in range(20):
+                candidates.add(tuple(rng.sample(squares, 2)))
+            for path in candidates:
+                try:
+                    record = board.make_move(list(path))
+                except ValueError as e:
+                    assert path not in legal
+                    assert str(e) == 'bad move'
+                else:
+                    assert path in legal
+                    board.unmake_move(record)
+            board.make_move(rng.choice(sorted(legal)))
+
+
+def test_make_legal_move(board_class):
+    rng = random.Random(2)
+    for game in range(5):
+        board = board_class(size=rng.choice([8, 10]))
+        checked = board.clone()
+        for ply in range(100):
+            moves = board.legal_moves(grouped=True)
+            if not moves:
+                break
+            move = rng.choice(moves)
+            record = board.make_legal_move(move)
+            assert record == checked.make_move(move.path)
+            assert board.pieces == checked.pieces
+            assert board.hash == checked.hash
+            assert board.eval_terms == checked.eval_terms
+
+
+def test_unmake_move(board_class):
+    situation = """[w]
+        | . . . .|
+        |. b b . |
+        | w . . .|
+        |. . . . |
+        | . . . .|
+        |. . . . |
+        | . . . .|
+        |. . . . |
+    """
+    board = board_class.load(situation)
+    record = board.make_move([cli.coord_from_name(n) for n in ['b6', 'd8']])
+    assert board.pieces == {(3, 7): 'W', (4, 6): 'b'}
+    board.unmake_move(record)
+    assert board == Board.load(situation)
+    check_prefix(board, ['b6'], {'d8'})
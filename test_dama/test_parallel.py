@@ -0,0 +1,58 @@
+import random
+
+import pytest
+
+from dama.board import Board
+from dama.engine import Engine
+from dama.parallel import ParallelEngine
+
+
+@pytest.fixture(scope='module')
+def parallel_engine():
+    with ParallelEngine(workers=2) as parallel_engine:
+        yield parallel_engine
+
+
+@pytest.mark.parametrize('depth', [1, 2, 4])
+def test_matches_single_process(parallel_engine, depth):
+    board = Board()
+    result = parallel_engine.search(board, depth)
+    single = Engine().search(board, depth=depth)
+    assert result.score == single.score
+    assert result.depth == depth
+    assert result.nodes > 1
+    assert board == Board()
+
+
+def test_forced_win(parallel_engine):
+    board = Board.load("""[w]
+        | . . . .|
+        |. . . . |
+        | . . . .|
+        |. b . . |
+        | . . . .|
+        |. . b . |
+        | . . . .|
+        |. . . W |
+    """)
+    result = parallel_engine.search(board, 4)
+    assert result.score == Engine().search(board, depth=4).score
+
+
+def test_shallower_after_deeper(parallel_engine):
+    # Workers keep their engines between searches; what a deeper search
+    # left in their tables must not change a shallower one
+    rng = random.Random(0)
+    boards = []
+    board = Board()
+    while len(boards) < 6:
+        moves = board.legal_moves()
+        if not moves:
+            board = Board()
+            continue
+        board.make_move(rng.choice(moves).path)
+        boards.append(board.clone())
+    for depth in 5, 3, 4:
+        for board in boards:
+            result = parallel_engine.search(board, depth)
+            assert result.score == Engine().search(board, depth=depth).score
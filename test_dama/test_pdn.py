@@ -0,0 +1,185 @@
+import io
+import random
+
+import pytest
+
+from dama.board import Board
+from dama import cli
+from dama import pdn
+
+
+def random_game(seed, plies=60, size=8):
+    rng = random.Random(seed)
+    board = Board(size=size)
+    records = []
+    for i in range(plies):
+        moves = board.legal_moves()
+        if not moves:
+            break
+        records.append(board.make_move(rng.choice(moves).path))
+    return board, records
+
+
+def write_archive(games):
+    out = io.StringIO()
+    for seed in range(games):
+        board, records = random_game(seed)
+        pdn.write_game(out, records, tags={'Event': f'game {seed}'})
+    return out.getvalue()
+
+
+def test_roundtrip():
+    board, records = random_game(0)
+    out = io.StringIO()
+    pdn.write_game(out, records, result='1-0', tags={'White': 'A "B"'})
+    [game] = pdn.read_games(io.StringIO(out.getvalue()))
+    assert game.tags == {'White': 'A "B"', 'Event': '?', 'Result': '1-0'}
+    assert game.result == '1-0'
+    assert len(game.moves) == len(records)
+    result = pdn.replay(game)
+    assert result.error is None
+    assert result.board.hash == board.hash
+    assert result.board.pieces == board.pieces
+
+
+def test_lines_are_wrapped():
+    board, records = random_game(1)
+    out = io.StringIO()
+    pdn.write_game(out, records)
+    assert all(len(line) <= 79 for line in out.getvalue().splitlines())
+
+
+def test_comments_and_move_numbers():
+    text = '''
+[Event "test"]
+1. c3-d4 {a comment} f6-e5
+{ a comment
+  spanning lines } 2. d4xf6 g7xe5 *
+'''
+    [game] = pdn.read_games(io.StringIO(text))
+    assert game.tags == {'Event': 'test'}
+    assert game.moves == ['c3-d4', 'f6-e5', 'd4xf6', 'g7xe5']
+    assert game.result == '*'
+    assert pdn.replay(game).error is None
+
+
+def test_games_without_result():
+    text = '1. c3-d4 f6-e5\n\n1. a3-b4\n[Event "x"]\n1. e3-f4\n'
+    games = list(pdn.read_games(io.StringIO(text)))
+    assert [g.moves for g in games] == [
+        ['c3-d4', 'f6-e5'], ['a3-b4'], ['e3-f4']]
+    assert games[2].tags == {'Event': 'x'}
+
+
+@pytest.mark.parametrize(['moves', 'error'], [
+    (['c3-d4', 'f6-e5', 'c1-d2'], pdn.ReplayError(2, 'c1-d2', 'illegal move')),
+    (['c3-d4', 'f6-e5', 'd4-f6'], pdn.ReplayError(2, 'd4-f6',
+                                                  'wrong capture marker')),
+    (['c3xd4'], pdn.ReplayError(0, 'c3xd4', 'wrong capture marker')),
+    (['c3'], pdn.ReplayError(0, 'c3', 'bad move: c3')),
+    (['c3-?4'], pdn.ReplayError(0, 'c3-?4', 'bad move: c3-?4')),
+])
+def test_replay_errors(moves, error):
+    result = pdn.replay(pdn.Game({}, moves, '*'))
+    assert result.error == error
+
+
+def test_replay_stops_before_bad_move():
+    result = pdn.replay(pdn.Game({}, ['c3-d4', 'f6-e5', 'd4-f6'], '*'))
+    expected = Board()
+    expected.make_move([(2, 2), (3, 3)])
+    expected.make_move([(5, 5), (4, 4)])
+    assert result.board.pieces == expected.pieces
+    assert result.board.hash == expected.hash
+
+
+def test_replay_large_board():
+    board, records = random_game(0, size=10)
+    out = io.StringIO()
+    pdn.write_game(out, records, size=10)
+    assert '[Size "10"]' in out.getvalue()
+    [game] = pdn.read_games(io.StringIO(out.getvalue()))
+    assert pdn.game_size(game) == 10
+    result = pdn.replay(game)
+    assert result.error is None
+    assert result.board.size == 10
+    assert result.board.pieces == board.pieces
+    out = io.StringIO()
+    pdn.write_game(out, records[:1])
+    assert 'Size' not in out.getvalue()
+
+
+@pytest.mark.parametrize('size', ['ten', '3000', '27', '1', '0', '-4'])
+def test_replay_bad_size(size):
+    game = pdn.Game({'Size': size}, ['c3-d4'], '*')
+    assert pdn.replay(game).error == pdn.ReplayError(
+        0, size, 'bad board size')
+
+
+def test_replay_largest_size():
+    board, records = random_game(0, plies=10, size=26)
+    out = io.StringIO()
+    pdn.write_game(out, records, size=26)
+    [game] = pdn.read_games(io.StringIO(out.getvalue()))
+    assert pdn.replay(game).board.pieces == board.pieces
+
+
+def test_validate_mixed_sizes(tmp_path):
+    out = io.StringIO()
+    for seed, size in enumerate([8, 10, 12]):
+        board, records = random_game(seed, size=size)
+        pdn.write_game(out, records, size=size)
+    path = tmp_path / 'mixed.pdn'
+    path.write_text(out.getvalue())
+    result = pdn.validate_file(path)
+    assert result.games == 3
+    assert result.errors == []
+
+
+@pytest.fixture
+def archive(tmp_path):
+    path = tmp_path / 'games.pdn'
+    text = write_archive(20)
+    text = text.replace('e3-f4', 'e3-f5', 1)
+    path.write_text(text)
+    return path
+
+
+@pytest.mark.parametrize('count', [1, 2, 3, 7, 50, 1000])
+def test_chunk_offsets(archive, count):
+    offsets = pdn.chunk_offsets(archive, count)
+    assert len(offsets) == count + 1
+    assert offsets[0] == 0
+    assert offsets[-1] == archive.stat().st_size
+    assert offsets == sorted(offsets)
+    data = archive.read_bytes()
+    for offset in offsets[1:-1]:
+        assert offset == len(data) or data[offset:offset + 1] == b'['
+    games = []
+    for start, end in zip(offsets, offsets[1:]):
+        games.extend(pdn.read_games(pdn._read_lines(archive, start, end)))
+    assert games == list(pdn.read_games(open(archive)))
+
+
+def test_validate_file(archive):
+    single = pdn.validate_file(archive)
+    assert single.games == 20
+    assert len(single.errors) == 1
+    index, tags, error = single.errors[0]
+    assert tags['Event'] == f'game {index}'
+    assert error.move == 'e3-f5'
+    assert error.reason == 'illegal move'
+    parallel = pdn.validate_file(archive, workers=2)
+    assert parallel._replace(elapsed=0) == single._replace(elapsed=0)
+
+
+def test_cli(archive, tmp_path, capsys):
+    assert cli.main(['pdn', str(archive), '--workers', '1']) == 1
+    out = capsys.readouterr().out
+    assert 'e3-f5: illegal move' in out
+    assert '20 games' in out
+
+    path = tmp_path / 'good.pdn'
+    path.write_text(write_archive(5))
+    assert cli.main(['pdn', str(path), '--workers', '1']) == 0
+    assert '5 games' in capsys.readouterr().out
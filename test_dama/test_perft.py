@@ -0,0 +1,33 @@
+import pytest
+
+from dama import cli
+from dama.perft import perft, reference_board, REFERENCE, BACKENDS
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('name', REFERENCE)
+def test_reference(name, backend):
+    board = reference_board(name, BACKENDS[backend])
+    before = board.dump()
+    size, diagram, expected = REFERENCE[name]
+    for depth, result in expected.items():
+        if result[0] > 2000:
+            break
+        assert perft(board, depth) == result
+    assert board.dump() == before
+
+
+def test_cli(capsys):
+    assert cli.main(['perft', '3']) == 0
+    out = capsys.readouterr().out
+    assert 'depth 3: nodes 302 captures 11 promotions 0' in out
+    assert 'nodes/s' in out
+
+
+def test_cli_file(tmp_path, capsys):
+    path = tmp_path / 'board.txt'
+    path.write_text(REFERENCE['kings'][1])
+    args = ['perft', '2', '--file', str(path), '--backend', 'bit']
+    assert cli.main(args) == 0
+    out = capsys.readouterr().out
+    assert 'depth 2: nodes 7 captures 3 promotions 3' in out
@@ -0,0 +1,140 @@
+import asyncio
+import concurrent.futures
+import tracemalloc
+
+import pytest
+
+from dama.board import Board
+from dama import common
+from dama import server
+
+
+@pytest.fixture(scope='module')
+def executor():
+    with concurrent.futures.ProcessPoolExecutor(
+            1, initializer=server._init_worker) as executor:
+        yield executor
+
+
+@pytest.fixture
+def game_server(executor):
+    return server.Server(executor)
+
+
+def run(game_server, *lines):
+    async def main():
+        return [await game_server.execute(line) for line in lines]
+    return asyncio.run(main())
+
+
+def test_game(game_server):
+    assert run(game_server, 'new', 'new 10') == ['ok 1', 'ok 2']
+    assert run(game_server, 'moves 1') == ['ok a3 c3 e3 g3']
+    assert run(game_server, 'moves 1 c3') == ['ok b4 d4']
+    assert run(game_server, 'move 1 c3 d4', 'moves 1') == [
+        'ok', 'ok b6 d6 f6 h6']
+    board = Board()
+    board.make_move([(2, 2), (3, 3)])
+    assert run(game_server, 'board 1') == [f'ok {board.to_bytes().hex()}']
+    assert run(game_server, 'board 2') == [
+        f'ok {Board(size=10).to_bytes().hex()}']
+    assert run(game_server, 'close 2', 'board 2') == [
+        'ok', 'error no such game: 2']
+
+
+@pytest.mark.parametrize(['line', 'reply'], [
+    ('', 'error empty command'),
+    ('fly 1', 'error unknown command: fly'),
+    ('new 8 9', 'error bad arguments for new'),
+    ('new x', 'error bad size: x'),
+    ('new 1000', 'error bad size: 1000'),
+    ('moves', 'error bad arguments for moves'),
+    ('moves 7', 'error no such game: 7'),
+    ('moves 1 ??', 'error bad square'),
+    ('moves 1 c1', 'error bad prefix'),
+    ('move 1 c3 c5', 'error illegal move'),
+    ('play 1 nan', 'error bad time: nan'),
+    ('play 1 -1', 'error bad time: -1'),
+])
+def test_errors(game_server, line, reply):
+    assert run(game_server, 'new', line) == ['ok 1', reply]
+
+
+def test_play(game_server):
+    replies = run(game_server, 'new', 'play 1 0.1', 'play 1 0.1', 'board 1')
+    assert replies[0] == 'ok 1'
+    board = Board()
+    for reply in replies[1:3]:
+        status, move = reply.split()
+        assert status == 'ok'
+        path = tuple(common.coord_from_name(name) for name in move.split('-'))
+        assert path in {m.path for m in board.legal_moves()}
+        board.make_move(path)
+    played = Board.from_bytes(bytes.fromhex(replies[3].split()[1]))
+    assert played.pieces == board.pieces
+    assert played.player == 'w'
+
+
+def test_busy_session(game_server):
+    async def main():
+        await game_server.execute('new')
+        await game_server.execute('new')
+        play = asyncio.create_task(game_server.execute('play 1 0.3'))
+        await asyncio.sleep(0.05)
+        replies = [await game_server.execute(line)
+                   for line in ['moves 1', 'new', 'moves 2']]
+        return await play, replies
+    played, replies = asyncio.run(main())
+    assert played.startswith('ok ')
+    assert replies == ['error engine is thinking', 'ok 3',
+                       'ok a3 c3 e3 g3']
+
+
+def test_stats(game_server):
+    run(game_server, 'new', 'moves 1', 'moves 1', 'fly')
+    [reply] = run(game_server, 'stats')
+    assert reply.startswith('ok moves n=2 p50=')
+    assert '; new n=1 ' in reply
+    assert 'fly' not in reply
+
+
+def test_session_limit(executor):
+    game_server = server.Server(executor, max_sessions=3)
+    run(game_server, *['new'] * 5)
+    assert list(game_server.sessions) == ['3', '4', '5']
+    run(game_server, 'moves 3', 'new')
+    assert list(game_server.sessions) == ['5', '3', '6']
+
+
+def test_idle_sessions_memory(game_server):
+    run(game_server, 'new', 'moves 1')
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    run(game_server, *['new'] * 10000)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    assert len(game_server.sessions) == 10001
+    assert used < 10000 * 2000
+
+
+def test_tcp(game_server):
+    async def main():
+        tcp_server = await game_server.start('localhost', 0)
+        port = tcp_server.sockets[0].getsockname()[1]
+        async with tcp_server:
+            clients = [await asyncio.open_connection('localhost', port)
+                       for i in range(3)]
+            replies = []
+            for reader, writer in clients:
+                writer.write(b'new\nmoves 1 c3\n')
+                await writer.drain()
+                replies.append(await reader.readline())
+                replies.append(await reader.readline())
+            for reader, writer in clients:
+                writer.write(b'quit\n')
+                assert await reader.read() == b''
+                writer.close()
+            return replies
+    replies = asyncio.run(main())
+    assert replies == [b'ok 1\n', b'ok b4 d4\n', b'ok 2\n', b'ok b4 d4\n',
+                       b'ok 3\n', b'ok b4 d4\n']
@@ -0,0 +1,92 @@
+import random
+
+import pytest
+
+from dama.board import Board
+from dama.engine import Engine, WIN
+from dama.tablebase import Indexer, Tablebase, generate, write
+from dama import cli
+
+
+@pytest.fixture(scope='module')
+def tablebase_path(tmp_path_factory):
+    path = tmp_path_factory.mktemp('tablebase') / 'six.tb'
+    write(path, 6, 2, generate(6, 2))
+    return path
+
+
+def test_indexer_roundtrip():
+    indexer = Indexer(6, 2)
+    for i in range(indexer.count):
+        pieces, player = indexer.position(i)
+        assert indexer.index(pieces, player) == i
+
+
+def test_indexer_roundtrip_random():
+    indexer = Indexer(10, 4)
+    rng = random.Random(0)
+    for i in range(1000):
+        i = rng.randrange(indexer.count)
+        assert indexer.index(*indexer.position(i)) == i
+
+
+def test_probe_matches_search(tablebase_path):
+    rng = random.Random(0)
+    with Tablebase(tablebase_path) as tablebase:
+        indexer = tablebase.indexer
+        checked = 0
+        while checked < 100:
+            pieces, player = indexer.position(rng.randrange(indexer.count))
+            board = Board(size=6, pieces=pieces, player=player)
+            result = tablebase.probe(board)
+            if result.distance is not None and result.distance > 7:
+                continue
+            checked += 1
+            score = Engine().score(board, result.distance or 4)
+            if result.result == 'win':
+                assert score == WIN - result.distance
+            elif result.result == 'loss':
+                assert score == -WIN + result.distance
+            else:
+                assert abs(score) < WIN - 100
+
+
+def test_probe_outside_table(tablebase_path):
+    with Tablebase(tablebase_path) as tablebase:
+        assert tablebase.probe(Board(size=6)) is None
+        assert tablebase.probe(Board(size=8)) is None
+
+
+def test_engine_with_tablebase(tablebase_path):
+    board = Board.load("""[w]
+        | . . .|
+        |. . . |
+        | . b .|
+        |. . . |
+        | . . .|
+        |. W . |
+    """)
+    with Tablebase(tablebase_path) as tablebase:
+        expected = tablebase.probe(board)
+        assert expected.result == 'win'
+        result = Engine(tablebase=tablebase).search(board, depth=5)
+    assert result.score == WIN - expected.distance
+    assert result.score == Engine().search(board, depth=5).score
+
+
+def test_cli(tmp_path, capsys):
+    path = tmp_path / 'tb'
+    assert cli.main(['tablebase', 'build', str(path), '--size', '6']) == 0
+    assert '5040 positions' in capsys.readouterr().out
+    diagram = tmp_path / 'board.txt'
+    diagram.write_text("""[b]
+        | . . .|
+        |. . . |
+        | . b .|
+        |. . . |
+        | . . .|
+        |. W . |
+    """)
+    assert cli.main(['tablebase', 'probe', str(path),
+                     '--file', str(diagram)]) == 0
+    assert capsys.readouterr().out == 'draw\n'
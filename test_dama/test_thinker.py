@@ -0,0 +1,76 @@
+import time
+
+import pytest
+
+from dama.board import Board
+from dama.thinker import BackgroundEngine
+
+
+@pytest.fixture
+def thinker():
+    with BackgroundEngine(think_time=0.2) as thinker:
+        yield thinker
+
+
+def wait(thinker, timeout=10):
+    end = time.perf_counter() + timeout
+    while time.perf_counter() < end:
+        result = thinker.poll()
+        if result is not None:
+            return result
+        time.sleep(0.01)
+    raise AssertionError('no result')
+
+
+def test_think(thinker):
+    board = Board()
+    assert thinker.poll() is None
+    thinker.think(board)
+    assert thinker.busy
+    result, reply = wait(thinker)
+    assert not thinker.busy
+    assert result.move in {m.path for m in board.legal_moves()}
+    board.make_move(result.move)
+    assert reply in {m.path for m in board.legal_moves()}
+    assert board.player == 'b'
+
+
+def test_ponder_hit(thinker):
+    board = Board()
+    thinker.think(board)
+    result, reply = wait(thinker)
+    board.make_move(result.move)
+    thinker.ponder(board, reply)
+    assert thinker.pondering
+    time.sleep(0.3)
+    assert thinker.poll() is None
+    board.make_move(reply)
+    start = time.perf_counter()
+    thinker.think(board)
+    result, reply = wait(thinker)
+    assert time.perf_counter() - start < 0.2
+    assert thinker.ponder_hits == 1
+    assert thinker.ponder_misses == 0
+    assert result.move in {m.path for m in board.legal_moves()}
+
+
+def test_ponder_miss(thinker):
+    board = Board()
+    thinker.think(board)
+    result, reply = wait(thinker)
+    board.make_move(result.move)
+    thinker.ponder(board, reply)
+    other = [m.path for m in board.legal_moves() if m.path != reply][0]
+    board.make_move(other)
+    thinker.think(board)
+    result, reply = wait(thinker)
+    assert thinker.ponder_hits == 0
+    assert thinker.ponder_misses == 1
+    assert result.move in {m.path for m in board.legal_moves()}
+
+
+def test_ponder_illegal_reply(thinker):
+    board = Board()
+    thinker.ponder(board, ((0, 0), (5, 5)))
+    assert not thinker.pondering
+    assert not thinker.busy
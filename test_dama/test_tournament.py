@@ -0,0 +1,141 @@
+import math
+import random
+
+import pytest
+
+from dama.board import openings
+from dama import cli
+from dama import pdn
+from dama import tournament
+
+
+def test_parse_player():
+    player = tournament.parse_player('nodes=500,king=250', 'A')
+    assert player == tournament.DEFAULT_PLAYER._replace(
+        name='A', nodes=500, king=250)
+    assert tournament.parse_player('', 'B').name == 'B'
+    player = tournament.parse_player('center=0,back_rank=9', 'C')
+    assert (player.center, player.back_rank) == (0, 9)
+    with pytest.raises(ValueError):
+        tournament.parse_player('speed=3', 'A')
+    with pytest.raises(ValueError):
+        tournament.parse_player('nodes', 'A')
+
+
+@pytest.mark.parametrize(['score', 'expected'], [
+    (0.5, 0),
+    (0.75, 190.8),
+    (0.25, -190.8),
+    (1, math.inf),
+    (0, -math.inf),
+])
+def test_elo(score, expected):
+    assert tournament.elo(score) == pytest.approx(expected, abs=0.1)
+
+
+def test_standing():
+    result = tournament.standing([1, 0.5, 0.5, 0, 1, 1])
+    assert result[:4] == (6, 3, 2, 1)
+    assert result.score == pytest.approx(4 / 6)
+    assert result.elo == pytest.approx(tournament.elo(4 / 6))
+    assert 0 < result.elo_error < math.inf
+    assert tournament.standing([0.5] * 4).elo_error == 0
+
+
+def test_play_game():
+    a = tournament.parse_player('depth=2', 'A')
+    b = tournament.parse_player('depth=2,advance=0', 'B')
+    opening = openings(8, 2)[0]
+    game = tournament.play_game(0, 0, opening, a, b, 8, 30)
+    assert game.white == 'A'
+    assert game.result in pdn.SCORES
+    assert [r.path for r in game.records[:2]] == list(opening)
+    assert len(game.records) <= 30
+    again = tournament.play_game(0, 0, opening, a, b, 8, 30)
+    assert again.records == game.records
+
+
+def test_random_line():
+    opening = openings(8, 2)[0]
+    line = tournament.random_line(8, opening, 6, random.Random(0))
+    assert line[:2] == list(opening)
+    assert len(line) == 8
+    assert line == tournament.random_line(8, opening, 6, random.Random(0))
+    lines = {tuple(tournament.random_line(8, opening, 6, random.Random(i)))
+             for i in range(10)}
+    assert len(lines) > 1
+    assert tournament.random_line(8, opening, 0, random.Random()) == list(
+        opening)
+
+
+def test_limit_games(capsys):
+    assert tournament.limit_games(10, 14, 0) == 10
+    assert tournament.limit_games(20, 14, 4) == 20
+    assert capsys.readouterr().out == ''
+    assert tournament.limit_games(20, 14, 0) == 14
+    assert 'only 14 distinct games' in capsys.readouterr().out
+
+
+def test_run_tournament_repeats(tmp_path, capsys):
+    # One opening ply gives 7 lines, so 14 distinct games at most
+    a = tournament.parse_player('depth=1', 'A')
+    b = tournament.parse_player('depth=1,king=100', 'B')
+    result = tournament.run_tournament(
+        a, b, opening_plies=1, games=16, workers=2, max_plies=10)
+    assert result.games == 14
+    assert 'only 14 distinct games' in capsys.readouterr().out
+    path = tmp_path / 'games.pdn'
+    with open(path, 'w') as output:
+        result = tournament.run_tournament(
+            a, b, opening_plies=1, games=16, workers=2, max_plies=10,
+            random_plies=4, output=output)
+    assert result.games == 16
+    assert 'distinct' not in capsys.readouterr().out
+    with open(path) as f:
+        games = list(pdn.read_games(f))
+    lines = {}
+    for game in games:
+        moves = tuple(game.moves[:5])
+        lines.setdefault(moves, set()).add(game.tags['White'])
+    # Every line is played once with each color
+    assert len(lines) == 8
+    assert all(colors == {'A', 'B'} for colors in lines.values())
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_run_tournament(tmp_path, workers, capsys):
+    a = tournament.parse_player('depth=2', 'A')
+    b = tournament.parse_player('depth=2,king=100', 'B')
+    path = tmp_path / 'games.pdn'
+    with open(path, 'w') as output:
+        result = tournament.run_tournament(
+            a, b, opening_plies=1, games=4, workers=workers, max_plies=30,
+            output=output)
+    assert result.games == 4
+    assert result.wins + result.draws + result.losses == 4
+    out = capsys.readouterr().out
+    assert 'A vs B' in out
+    assert 'games/s' in out
+    with open(path) as f:
+        games = list(pdn.read_games(f))
+    assert sorted(g.tags['Round'] for g in games) == ['1', '2', '3', '4']
+    assert all(pdn.replay(g).error is None for g in games)
+    assert {g.tags['White'] for g in games} == {'A', 'B'}
+
+
+def test_cli(tmp_path, capsys):
+    path = tmp_path / 'games.pdn'
+    assert cli.main(['tournament', '-a', 'depth=1', '-b', 'depth=2',
+                     '--games', '2', '--opening-plies', '1',
+                     '--random-plies', '2', '--seed', '3',
+                     '--max-plies', '20', '--workers', '1',
+                     '--output', str(path)]) == 0
+    assert 'A vs B' in capsys.readouterr().out
+    assert len(list(pdn.read_games(open(path)))) == 2
+    assert cli.main(['tournament', '-a', 'depth=1', '-b', 'depth=1',
+                     '--size', '10', '--games', '2', '--opening-plies', '1',
+                     '--max-plies', '20', '--workers', '1',
+                     '--output', str(path)]) == 0
+    assert cli.main(['pdn', str(path), '--workers', '1']) == 0
+    assert cli.main(['tournament', '-a', 'bogus=1']) == 1
+    assert cli.main(['tournament', '-a', 'name=B']) == 1